@@ -0,0 +1,407 @@
+"""
+API benchmark for Average2Epic
+
+Seeds a dedicated database with generated videos and contacts, then drives the
+FastAPI app in-process (no HTTP server or client library; requests go straight
+through the ASGI interface) at each concurrency level and reports p50/p95/p99
+latency and requests per second per endpoint.
+
+    python benchmark_api.py --videos 2000 --concurrency 1,10,50 --output bench.json
+    python benchmark_api.py --no-seed --compare bench.json
+
+Seeding empties the videos, contacts and video_related collections, so the
+target is never taken from .env: it is --mongo-url (default
+mongodb://localhost:27017) and --db-name (default average2epic_bench). Any
+other host, or a database name not ending in "_bench", is refused unless
+--force is given. --in-memory uses mongomock_motor instead
+(pip install mongomock-motor); endpoints relying on $text or other operators
+mongomock lacks are then reported with errors.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+DEFAULT_MONGO_URL = "mongodb://localhost:27017"
+DEFAULT_DB_NAME = "average2epic_bench"
+BENCH_DB_SUFFIX = "_bench"
+LOCAL_HOSTS = frozenset({"localhost", "127.0.0.1", "::1"})
+
+WORDS = (
+    "discipline consistency morning routine workout gym training focus mindset "
+    "progress update grind hustle motivation journey growth habit sleep energy "
+    "nutrition reading journal meditation cold shower run walk code build ship "
+    "learn fail retry patience family friends work goals plan review reflect"
+).split()
+
+TOPIC_TAGS = ["Fitness", "Morning Routine", "Discipline", "Mindset", "Progress"]
+
+Request = Tuple[str, str, Dict[str, str], Optional[dict], Dict[str, str]]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Average2Epic API in-process")
+    parser.add_argument("--videos", type=int, default=1000, help="videos to seed")
+    parser.add_argument("--tags", type=int, default=20, help="distinct topic tags")
+    parser.add_argument("--contacts", type=int, default=200, help="contacts to seed")
+    parser.add_argument("--concurrency", default="1,10,50", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint and level")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests before each run")
+    parser.add_argument("--endpoints", help="comma-separated subset of endpoints to run")
+    parser.add_argument("--mongo-url", default=DEFAULT_MONGO_URL,
+                        help="MongoDB to benchmark against (MONGO_URL from .env is ignored)")
+    parser.add_argument("--db-name", default=DEFAULT_DB_NAME, help="database to seed and query")
+    parser.add_argument("--force", action="store_true",
+                        help="allow a non-local --mongo-url or a --db-name not ending in _bench")
+    parser.add_argument("--in-memory", action="store_true", help="use mongomock_motor instead of --mongo-url")
+    parser.add_argument("--no-seed", action="store_true", help="reuse the data already in --db-name")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="bypass the response caches (no storing or coalescing) and the count cache")
+    parser.add_argument("--random-seed", type=int, default=42, help="seed for generated data and request mix")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent slowdown in p95 or RPS counted as a regression")
+    return parser.parse_args(argv)
+
+
+def mongo_hosts(url: str) -> List[str]:
+    """Host names in a mongodb:// or mongodb+srv:// URL, without ports or credentials"""
+    authority = url.split("://", 1)[-1].split("/", 1)[0].split("?", 1)[0]
+    hosts = []
+    for host in authority.rsplit("@", 1)[-1].split(","):
+        if host.startswith("["):
+            host = host[1:host.find("]")]
+        else:
+            host = host.split(":", 1)[0]
+        hosts.append(host.lower())
+    return hosts
+
+
+def check_target(mongo_url: str, db_name: str):
+    """Refuse to seed anything but a local *_bench database"""
+    remote = [host for host in mongo_hosts(mongo_url) if host not in LOCAL_HOSTS]
+    if mongo_url.startswith("mongodb+srv://") or remote:
+        raise SystemExit(
+            f"❌ Refusing to benchmark against {', '.join(remote) or 'an SRV cluster'}: "
+            "seeding deletes data. Pass --force if that is really intended"
+        )
+    if not db_name.endswith(BENCH_DB_SUFFIX):
+        raise SystemExit(
+            f"❌ Refusing to use database '{db_name}': seeding deletes data and only "
+            f"databases ending in '{BENCH_DB_SUFFIX}' are allowed without --force"
+        )
+
+
+def configure_environment(args):
+    """Must run before the app is imported: settings are read at import time"""
+    if not args.in_memory and not args.force:
+        check_target(args.mongo_url, args.db_name)
+    # Set explicitly so database.py's load_dotenv can't point the app at .env's MONGO_URL
+    os.environ["MONGO_URL"] = args.mongo_url
+    os.environ["DB_NAME"] = args.db_name
+    # The benchmark user must not be throttled
+    os.environ["DB_API_RATE_LIMITS"] = json.dumps({"read": None, "write": None, "delete": None})
+    if args.no_cache:
+        # A zero TTL makes ResponseCache call the loader every time and
+        # CountCache count every time, so each request runs its queries
+        for name in ("VIDEO_CACHE_TTL", "DB_STATS_CACHE_TTL", "VIDEO_COUNT_CACHE_TTL"):
+            os.environ[name] = "0"
+
+
+def load_app(in_memory: bool):
+    """Import the app, with database.db swapped for mongomock_motor if asked"""
+    import database
+    if in_memory:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("❌ --in-memory needs mongomock-motor (pip install mongomock-motor)")
+        # Routes bind `db` at import, so swap it before they are loaded
+        database.client = AsyncMongoMockClient()
+        database.db = database.client[os.environ["DB_NAME"]]
+    import server
+    return server.app, database
+
+
+def generate_videos(count: int, tag_count: int, rng: random.Random) -> List[dict]:
+    tags = TOPIC_TAGS + [f"Topic {i}" for i in range(max(tag_count - len(TOPIC_TAGS), 0))]
+    tags = tags[:tag_count]
+    start = datetime(2024, 1, 1)
+    videos = []
+    for day in range(1, count + 1):
+        reflection = " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 160)))
+        title = f"Day {day} - {' '.join(rng.choice(WORDS) for _ in range(4)).title()}"
+        now = datetime.utcnow()
+        videos.append({
+            "title": title,
+            "youtubeId": f"bench{day:07d}",
+            "embedUrl": f"https://www.youtube.com/embed/bench{day:07d}",
+            "day": day,
+            "date": (start + timedelta(days=day)).strftime('%Y-%m-%d'),
+            "reflection": reflection,
+            "tags": ["Average2Epic", f"Day {day}", "Transformation"] + rng.sample(tags, k=min(rng.randint(1, 3), len(tags))),
+            "excerpt": reflection[:80] + "...",
+            "createdAt": now,
+            "updatedAt": now
+        })
+    return videos
+
+
+def generate_contacts(count: int, rng: random.Random) -> List[dict]:
+    return [
+        {
+            "name": f"Bench User {i}",
+            "email": f"bench{i}@example.com",
+            "area": rng.choice(["fitness", "coding", "mindset", "other"]),
+            "message": " ".join(rng.choice(WORDS) for _ in range(30)),
+            "status": "new",
+            "createdAt": datetime.utcnow() - timedelta(minutes=i)
+        }
+        for i in range(count)
+    ]
+
+
+async def seed(db, args, rng: random.Random):
+    started = time.perf_counter()
+    await db.videos.delete_many({})
+    await db.contacts.delete_many({})
+    await db.video_related.delete_many({})
+    videos = generate_videos(args.videos, args.tags, rng)
+    for start in range(0, len(videos), 1000):
+        await db.videos.insert_many(videos[start:start + 1000], ordered=False)
+    contacts = generate_contacts(args.contacts, rng)
+    if contacts:
+        await db.contacts.insert_many(contacts, ordered=False)
+    print(f"🌱 Seeded {len(videos)} videos and {len(contacts)} contacts "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+async def call(app, method: str, path: str, query: Dict[str, str] = None,
+               body: Optional[dict] = None, headers: Dict[str, str] = None) -> Tuple[int, int]:
+    """Send one request through the ASGI app; returns (status, response bytes)"""
+    payload = json.dumps(body).encode() if body is not None else b""
+    raw_headers = [(b"host", b"benchmark")]
+    if body is not None:
+        raw_headers += [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())]
+    raw_headers += [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": urlencode(query or {}).encode(),
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("benchmark", 80),
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        # Nothing more to read; wait like a connected client would
+        await asyncio.Event().wait()
+
+    status = 0
+    size = 0
+
+    async def send(message):
+        nonlocal status, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, size
+
+
+def build_endpoints(video_ids: List[str], tags: List[str], rng: random.Random) -> Dict[str, Callable[[], Request]]:
+    """Endpoint name -> factory for its next request (method, path, query, body, headers)"""
+    from utils.api_keys import DEFAULT_API_KEYS
+    api_user = "average2epic_readonly"
+    api_headers = {"X-API-User": api_user, "X-API-Key": DEFAULT_API_KEYS[api_user]["key"]}
+    pages = max(len(video_ids) // 12, 1)
+
+    return {
+        "videos_page1": lambda: ("GET", "/api/videos", {"page": "1", "limit": "12"}, None, {}),
+        "videos_random_page": lambda: ("GET", "/api/videos", {"page": str(rng.randint(1, pages)), "limit": "12"}, None, {}),
+        "videos_cursor": lambda: ("GET", "/api/videos", {"after": "", "limit": "12"}, None, {}),
+        "videos_by_tag": lambda: ("GET", "/api/videos", {"tag": rng.choice(tags), "limit": "12"}, None, {}),
+        "videos_full": lambda: ("GET", "/api/videos", {"limit": "100", "fields": "full"}, None, {}),
+        "video_detail": lambda: ("GET", f"/api/videos/{rng.choice(video_ids)}", {}, None, {}),
+        "tags_all": lambda: ("GET", "/api/videos/tags/all", {}, None, {}),
+        "tag_counts": lambda: ("GET", "/api/videos/tags/counts", {}, None, {}),
+        "search": lambda: ("GET", "/api/videos/search", {"q": rng.choice(WORDS)}, None, {}),
+        "db_query": lambda: (
+            "POST", "/api/db/query", {},
+            {"collection": "videos", "filter": {"tags": rng.choice(tags)}, "projection": {"reflection": 0}, "limit": 50},
+            api_headers
+        ),
+    }
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+async def run_endpoint(app, make_request, total: int, concurrency: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        method, path, query, body, headers = make_request()
+        await call(app, method, path, query, body, headers)
+
+    latencies: List[float] = []
+    errors = 0
+    statuses: Dict[int, int] = {}
+    response_bytes = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors, response_bytes
+        while remaining > 0:
+            remaining -= 1
+            method, path, query, body, headers = make_request()
+            started = time.perf_counter()
+            status, size = await call(app, method, path, query, body, headers)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+            response_bytes += size
+            if status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "rps": round(len(latencies) / wall, 1) if wall > 0 else 0.0,
+        "avg_bytes": round(response_bytes / len(latencies)) if latencies else 0
+    }
+
+
+def compare(results: List[dict], baseline_file: str, threshold: float) -> int:
+    """Print p95/RPS changes against a baseline; returns the number of regressions"""
+    baseline = {
+        (entry["endpoint"], entry["concurrency"]): entry
+        for entry in json.loads(Path(baseline_file).read_text())["results"]
+    }
+    regressions = 0
+    print(f"\n📊 Compared with {baseline_file} (regression threshold {threshold:.0f}%)")
+    print(f"{'endpoint':<22}{'conc':>6}{'p95 ms':>12}{'Δp95':>9}{'rps':>10}{'Δrps':>9}")
+    for entry in results:
+        before = baseline.get((entry["endpoint"], entry["concurrency"]))
+        if before is None:
+            continue
+        p95_change = (entry["p95_ms"] / before["p95_ms"] - 1) * 100 if before["p95_ms"] else 0.0
+        rps_change = (entry["rps"] / before["rps"] - 1) * 100 if before["rps"] else 0.0
+        regressed = p95_change > threshold or rps_change < -threshold
+        regressions += regressed
+        print(f"{entry['endpoint']:<22}{entry['concurrency']:>6}{entry['p95_ms']:>12.2f}"
+              f"{p95_change:>+8.1f}%{entry['rps']:>10.1f}{rps_change:>+8.1f}%{'  ⚠️' if regressed else ''}")
+    return regressions
+
+
+async def benchmark(args) -> int:
+    rng = random.Random(args.random_seed)
+    app, database = load_app(args.in_memory)
+    db = database.db
+
+    if not args.in_memory:
+        if not await database.connect():
+            raise SystemExit("❌ MongoDB not reachable; start mongod or use --in-memory")
+        from indexes import ensure_indexes, summarize
+        print(summarize(await ensure_indexes(db)))
+
+    if not args.no_seed:
+        await seed(db, args, rng)
+
+    video_ids = [str(doc["_id"]) async for doc in db.videos.find({}, {"_id": 1})]
+    if not video_ids:
+        raise SystemExit(f"❌ No videos in {args.db_name}; run without --no-seed")
+    tags = sorted(set(await db.videos.distinct("tags")) - {"Average2Epic", "Transformation"})
+    tags = [tag for tag in tags if not tag.startswith("Day ")] or ["Average2Epic"]
+
+    endpoints = build_endpoints(video_ids, tags, rng)
+    if args.endpoints:
+        selected = [name.strip() for name in args.endpoints.split(",")]
+        unknown = set(selected) - set(endpoints)
+        if unknown:
+            raise SystemExit(f"❌ Unknown endpoints: {', '.join(sorted(unknown))}; choose from {', '.join(endpoints)}")
+        endpoints = {name: endpoints[name] for name in selected}
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    print(f"🏁 {len(endpoints)} endpoints × {len(levels)} concurrency levels, {args.requests} requests each\n")
+    print(f"{'endpoint':<22}{'conc':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>10}{'errors':>8}")
+
+    results = []
+    for concurrency in levels:
+        for name, make_request in endpoints.items():
+            stats = await run_endpoint(app, make_request, args.requests, concurrency, args.warmup)
+            results.append({"endpoint": name, "concurrency": concurrency, **stats})
+            print(f"{name:<22}{concurrency:>6}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+                  f"{stats['p99_ms']:>10.2f}{stats['rps']:>10.1f}{stats['errors']:>8}")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mode": "in-memory" if args.in_memory else "mongod",
+            "videos": len(video_ids),
+            "cache": not args.no_cache,
+            # The URL may carry credentials; only its hosts go into the report
+            "args": {**vars(args), "mongo_url": ",".join(mongo_hosts(args.mongo_url))}
+        },
+        "results": results
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\n💾 Results written to {args.output}")
+
+    regressions = compare(results, args.compare, args.threshold) if args.compare else 0
+    if not args.in_memory:
+        database.close()
+    return regressions
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure_environment(args)
+    regressions = asyncio.run(benchmark(args))
+    if regressions:
+        print(f"\n⚠️  {regressions} regression(s) beyond {args.threshold:.0f}%")
+    sys.exit(1 if regressions else 0)
@@ -1,12 +1,60 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+from utils.metrics import mongo_listener
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+logger = logging.getLogger(__name__)
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+# Connection pool and timeout settings, overridable per deployment
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": _env_int("MONGO_MAX_POOL_SIZE", 50),
+    "minPoolSize": _env_int("MONGO_MIN_POOL_SIZE", 5),
+    "maxIdleTimeMS": _env_int("MONGO_MAX_IDLE_TIME_MS", 300000),
+    "serverSelectionTimeoutMS": _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+    "connectTimeoutMS": _env_int("MONGO_CONNECT_TIMEOUT_MS", 10000),
+    "socketTimeoutMS": _env_int("MONGO_SOCKET_TIMEOUT_MS", 60000),
+}
+
+# Wire compression, e.g. "zstd,snappy,zlib"; zstd needs `zstandard` and
+# snappy needs `python-snappy` installed, zlib is always available
+if os.environ.get("MONGO_COMPRESSORS"):
+    MONGO_CLIENT_OPTIONS["compressors"] = os.environ["MONGO_COMPRESSORS"]
+
+# Connections opened up front by connect(), so the first requests after a
+# deploy don't pay for the handshake
+MONGO_WARM_CONNECTIONS = _env_int("MONGO_WARM_CONNECTIONS", MONGO_CLIENT_OPTIONS["minPoolSize"])
+
+# MongoDB connection. Motor does no I/O until first use; connect() and close()
+# are driven by the app lifespan in server.py
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# mongo_listener times every command for /api/metrics
+client = AsyncIOMotorClient(mongo_url, event_listeners=[mongo_listener], **MONGO_CLIENT_OPTIONS)
 db = client[os.environ['DB_NAME']]
+
+async def connect() -> bool:
+    """Ping the server and open MONGO_WARM_CONNECTIONS pooled connections"""
+    try:
+        await db.command("ping")
+        # Concurrent pings each check out their own connection
+        extra = max(MONGO_WARM_CONNECTIONS - 1, 0)
+        if extra:
+            await asyncio.gather(*(db.command("ping") for _ in range(extra)))
+        logger.info("MongoDB connected, %d connection(s) warmed", max(MONGO_WARM_CONNECTIONS, 1))
+        return True
+    except Exception as e:
+        # Keep serving; the driver reconnects once the server is reachable
+        logger.error("MongoDB not reachable at startup: %s", e)
+        return False
+
+def close():
+    client.close()
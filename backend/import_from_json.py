@@ -41,25 +41,197 @@ YouTube ID extraction is automatic.
 RECOMMENDED: Option 1 (takes 2 minutes)
 """
 
+import argparse
 import asyncio
+import inspect
 import json
+import time
 from motor.motor_asyncio import AsyncIOMotorClient
+from indexes import ensure_indexes, summarize
+from models.video import VideoCreate
+from utils.enrichment import extract_day, make_excerpt
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
 from dotenv import load_dotenv
 import os
 from pathlib import Path
 from datetime import datetime
-import re
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-async def import_from_json():
-    """Import videos from JSON file"""
-    
-    json_file = ROOT_DIR / 'playlist_data.json'
-    
+DEFAULT_JSON_FILE = ROOT_DIR / 'playlist_data.json'
+
+# Documents per $in lookup and insert_many call
+DEFAULT_BATCH_SIZE = 500
+
+# Bytes read at a time while parsing a JSON array
+READ_CHUNK_SIZE = 64 * 1024
+
+# Characters that can follow a number inside an array
+NUMBER_DELIMITERS = ",] \t\r\n"
+
+def iter_json_array(f):
+    """Yield the elements of a top-level JSON array without loading the whole file"""
+    decoder = json.JSONDecoder()
+    buffer = f.read(READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError("expected a JSON array")
+    buffer = buffer[1:]
+    eof = False
+
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+            # Only a number can parse short ("12" of "12.5e3"); it is complete
+            # once a delimiter follows it
+            complete = (
+                eof
+                or isinstance(item, bool)
+                or not isinstance(item, (int, float))
+                or (end < len(buffer) and buffer[end] in NUMBER_DELIMITERS)
+            )
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            # The element is split across chunks; read more and retry
+            chunk = f.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+def iter_records(path):
+    """Records from a JSON array or an NDJSON file (one object per line)"""
+    with open(path, 'r') as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == '[':
+            yield from iter_json_array(f)
+            return
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"❌ Line {line_number}: invalid JSON ({e.msg})")
+
+def build_video_doc(video_data):
+    """Video document for a playlist_data.json record, validated against VideoCreate"""
+    video_id = video_data.get('videoId') or video_data.get('youtubeId', '')
+    title = video_data.get('title', '')
+    # Day from the title if present, else the record's own
+    day = extract_day(title, video_data.get('day', 1))
+
+    # Default reflection
+    reflection = video_data.get('reflection') or f"Day {day} of my Average2Epic transformation journey. Watch as I continue building consistency and discipline."
+    excerpt = make_excerpt(reflection)
+
+    # Default tags
+    tags = video_data.get('tags') or ["Average2Epic", f"Day {day}", "Transformation", "Journey"]
+
+    video = VideoCreate(
+        title=title,
+        youtubeId=video_id,
+        embedUrl=f"https://www.youtube.com/embed/{video_id}",
+        day=day,
+        date=video_data.get('date') or datetime.utcnow().strftime('%Y-%m-%d'),
+        reflection=reflection,
+        tags=tags
+    )
+    now = datetime.utcnow()
+    return {**video.model_dump(), "excerpt": excerpt, "createdAt": now, "updatedAt": now}
+
+async def _resolve(result):
+    # Motor returns awaitables, pymongo/mongomock collections return results directly
+    return await result if inspect.isawaitable(result) else result
+
+async def insert_batch(collection, docs):
+    """Insert the documents not already in `collection`; returns (inserted, skipped)"""
+    ids = [doc["youtubeId"] for doc in docs]
+    existing = set(await _resolve(collection.distinct("youtubeId", {"youtubeId": {"$in": ids}})))
+    new_docs = [doc for doc in docs if doc["youtubeId"] not in existing]
+    if not new_docs:
+        return 0, len(docs)
+    try:
+        await _resolve(collection.insert_many(new_docs, ordered=False))
+        inserted = len(new_docs)
+    except BulkWriteError as e:
+        # Duplicates inserted concurrently are rejected by the unique index
+        inserted = e.details.get("nInserted", 0)
+    return inserted, len(docs) - inserted
+
+async def import_records(collection, records, batch_size=DEFAULT_BATCH_SIZE):
+    """Validate, dedupe and insert records in batches; returns counts for the summary"""
+    counts = {"read": 0, "imported": 0, "skipped": 0, "invalid": 0}
+    seen = set()
+    batch = []
+    started = time.perf_counter()
+
+    async def flush():
+        inserted, skipped = await insert_batch(collection, batch)
+        counts["imported"] += inserted
+        counts["skipped"] += skipped
+        batch.clear()
+        elapsed = time.perf_counter() - started
+        print(f"  📥 {counts['read']} read, {counts['imported']} imported, "
+              f"{counts['skipped']} skipped ({counts['read'] / elapsed:.0f} records/s)")
+
+    for video_data in records:
+        counts["read"] += 1
+        try:
+            video_doc = build_video_doc(video_data)
+        except (ValidationError, AttributeError, TypeError) as e:
+            print(f"⏭️  Skipped record {counts['read']}: invalid ({str(e).splitlines()[0]})")
+            counts["invalid"] += 1
+            continue
+        if not video_doc["youtubeId"] or not video_doc["title"]:
+            print(f"⏭️  Skipped record {counts['read']}: missing data")
+            counts["invalid"] += 1
+            continue
+        # Repeats within the file never reach the database
+        if video_doc["youtubeId"] in seen:
+            counts["skipped"] += 1
+            continue
+        seen.add(video_doc["youtubeId"])
+
+        batch.append(video_doc)
+        if len(batch) >= batch_size:
+            await flush()
+
+    if batch:
+        await flush()
+    counts["seconds"] = time.perf_counter() - started
+    return counts
+
+def open_collection(use_mongomock):
+    """(collection, client) for MONGO_URL, or an in-memory mongomock collection"""
+    if use_mongomock:
+        try:
+            import mongomock
+        except ImportError:
+            raise SystemExit("❌ --mongomock needs the mongomock package (pip install mongomock)")
+        client = mongomock.MongoClient()
+        return client['average2epic'].videos, client
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    return client[os.environ['DB_NAME']].videos, client
+
+async def import_from_json(json_file=DEFAULT_JSON_FILE, batch_size=DEFAULT_BATCH_SIZE, use_mongomock=False):
+    """Import videos from a JSON or NDJSON file"""
+
+    json_file = Path(json_file)
+
     if not json_file.exists():
-        print("❌ playlist_data.json not found!")
+        print(f"❌ {json_file.name} not found!")
         print("\n📋 Follow these steps:")
         print("1. Open: https://www.youtube.com/playlist?list=PLG7v1z1ZY96eVnBd3DHyMgEQXB8_VQc3u")
         print("2. Press F12 to open browser console")
@@ -78,76 +250,35 @@ console.log(JSON.stringify(videos, null, 2));
         print("5. Save as: /app/backend/playlist_data.json")
         print("6. Run this script again")
         return
-    
-    # Connect to MongoDB
-    mongo_url = os.environ['MONGO_URL']
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[os.environ['DB_NAME']]
-    
-    # Load JSON
-    with open(json_file, 'r') as f:
-        videos = json.load(f)
-    
-    print(f"📹 Found {len(videos)} videos to import\n")
-    
-    imported_count = 0
-    skipped_count = 0
-    
-    for video_data in videos:
-        try:
-            video_id = video_data.get('videoId', '')
-            title = video_data.get('title', '')
-            day = video_data.get('day', 1)
-            
-            if not video_id or not title:
-                print(f"⏭️  Skipped: Missing data")
-                continue
-            
-            # Check if exists
-            existing = await db.videos.find_one({"youtubeId": video_id})
-            if existing:
-                print(f"⏭️  Skipped: Day {day} - {title} (already exists)")
-                skipped_count += 1
-                continue
-            
-            # Extract day from title if present
-            day_match = re.search(r'[Dd]ay\s*(\d+)', title)
-            if day_match:
-                day = int(day_match.group(1))
-            
-            # Default reflection
-            reflection = f"Day {day} of my Average2Epic transformation journey. Watch as I continue building consistency and discipline."
-            excerpt = reflection[:80] + "..."
-            
-            # Default tags
-            tags = ["Average2Epic", f"Day {day}", "Transformation", "Journey"]
-            
-            # Create video document
-            video_doc = {
-                "title": title,
-                "youtubeId": video_id,
-                "embedUrl": f"https://www.youtube.com/embed/{video_id}",
-                "day": day,
-                "date": datetime.utcnow().strftime('%Y-%m-%d'),
-                "reflection": reflection,
-                "tags": tags,
-                "excerpt": excerpt,
-                "createdAt": datetime.utcnow(),
-                "updatedAt": datetime.utcnow()
-            }
-            
-            await db.videos.insert_one(video_doc)
-            print(f"✅ Imported: Day {day} - {title}")
-            imported_count += 1
-            
-        except Exception as e:
-            print(f"❌ Error: {str(e)}")
-    
+
+    collection, client = open_collection(use_mongomock)
+    if not use_mongomock:
+        print(summarize(await ensure_indexes(collection.database)))
+
+    print(f"📹 Importing {json_file.name} in batches of {batch_size}\n")
+
+    try:
+        counts = await import_records(collection, iter_records(json_file), batch_size)
+    except (ValueError, json.JSONDecodeError) as e:
+        print(f"❌ Could not parse {json_file.name}: {e}")
+        client.close()
+        return None
+
+    seconds = counts["seconds"]
     print(f"\n🎉 Import Complete!")
-    print(f"✅ Imported: {imported_count} videos")
-    print(f"⏭️  Skipped: {skipped_count} videos")
-    
+    print(f"✅ Imported: {counts['imported']} videos")
+    print(f"⏭️  Skipped: {counts['skipped']} videos (already exist)")
+    print(f"❌ Invalid: {counts['invalid']} records")
+    print(f"⏱️  {counts['read']} records in {seconds:.2f}s "
+          f"({counts['read'] / seconds if seconds > 0 else 0:.0f} records/s)")
+
     client.close()
+    return counts
 
 if __name__ == "__main__":
-    asyncio.run(import_from_json())
+    parser = argparse.ArgumentParser(description="Import videos from a JSON array or NDJSON file")
+    parser.add_argument("file", nargs="?", default=str(DEFAULT_JSON_FILE), help="JSON or NDJSON file")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="documents per insert_many")
+    parser.add_argument("--mongomock", action="store_true", help="import into an in-memory mongomock database")
+    args = parser.parse_args()
+    asyncio.run(import_from_json(args.file, args.batch_size, args.mongomock))
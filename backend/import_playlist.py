@@ -1,11 +1,12 @@
 import asyncio
 from pytube import Playlist
 from motor.motor_asyncio import AsyncIOMotorClient
+from indexes import ensure_indexes, summarize
+from utils.enrichment import enricher, extract_day, make_excerpt
 from dotenv import load_dotenv
 import os
 from pathlib import Path
 from datetime import datetime
-import re
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -15,6 +16,7 @@ async def import_playlist():
     mongo_url = os.environ['MONGO_URL']
     client = AsyncIOMotorClient(mongo_url)
     db = client[os.environ['DB_NAME']]
+    print(summarize(await ensure_indexes(db)))
     
     # Playlist URL
     playlist_url = "https://www.youtube.com/playlist?list=PLG7v1z1ZY96eVnBd3DHyMgEQXB8_VQc3u"
@@ -43,8 +45,7 @@ async def import_playlist():
                 
                 # Try to extract day number from title
                 title = yt.title
-                day_match = re.search(r'[Dd]ay\s*(\d+)', title)
-                day_number = int(day_match.group(1)) if day_match else idx
+                day_number = extract_day(title, idx)
                 
                 # Check if video already exists
                 existing = await db.videos.find_one({"youtubeId": video_id})
@@ -61,18 +62,10 @@ async def import_playlist():
                 reflection = description[:500] if description else f"Watch Day {day_number} of my Average2Epic journey."
                 
                 # Create excerpt
-                excerpt = reflection[:80] + "..." if len(reflection) > 80 else reflection
+                excerpt = make_excerpt(reflection)
                 
-                # Default tags
-                tags = ["Average2Epic", "Day " + str(day_number), "Transformation"]
-                
-                # Add more specific tags based on title
-                if any(word in title.lower() for word in ['fitness', 'workout', 'gym', 'training']):
-                    tags.append("Fitness")
-                if any(word in title.lower() for word in ['morning', 'routine']):
-                    tags.append("Morning Routine")
-                if any(word in title.lower() for word in ['grind', 'discipline', 'consistency']):
-                    tags.append("Discipline")
+                # Default tags plus rule tags matched in the title
+                tags = enricher.enrich(title, default_day=day_number)["tags"]
                 
                 # Create video document
                 video_doc = {
@@ -1,189 +1,381 @@
+import argparse
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
+from indexes import ensure_indexes, summarize
+from utils.enrichment import enricher, make_excerpt
+from pymongo import UpdateOne
 from dotenv import load_dotenv
 import os
 from pathlib import Path
 from datetime import datetime
-import re
-import subprocess
+import time
 import json
+import hashlib
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-async def import_playlist_with_descriptions():
-    """Import YouTube playlist with full descriptions and update existing videos"""
-    
-    # Playlist URL
-    playlist_url = "https://www.youtube.com/playlist?list=PLG7v1z1ZY96eVnBd3DHyMgEQXB8_VQc3u"
-    
-    print(f"📺 Fetching playlist with full descriptions...")
-    print(f"🔗 URL: {playlist_url}\n")
-    
+PLAYLIST_URL = "https://www.youtube.com/playlist?list=PLG7v1z1ZY96eVnBd3DHyMgEQXB8_VQc3u"
+
+# yt-dlp processes run at once while fetching per-video details
+DEFAULT_WORKERS = 8
+
+# Raw yt-dlp JSON is kept here so offline runs can skip the network and
+# failed fetches can fall back to the last good details
+DEFAULT_CACHE_DIR = ROOT_DIR / '.ytdlp_cache'
+
+# In incremental mode, videos whose lastFetchedAt is older than this are fetched again
+DEFAULT_TTL_HOURS = 24
+
+# Fields covered by contentHash; a sync skips the write when they are unchanged
+HASHED_FIELDS = ("title", "youtubeId", "embedUrl", "day", "date", "reflection", "tags", "excerpt")
+
+class FetchCache:
+    """On-disk cache of raw yt-dlp output"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        (self.root / 'videos').mkdir(parents=True, exist_ok=True)
+
+    def _playlist_path(self, playlist_url):
+        return self.root / f"playlist-{hashlib.sha1(playlist_url.encode()).hexdigest()[:12]}.json"
+
+    def _video_path(self, video_id):
+        return self.root / 'videos' / f"{video_id}.json"
+
+    @staticmethod
+    def _write(path, data):
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(data))
+        tmp.replace(path)
+
+    @staticmethod
+    def _read(path):
+        try:
+            return json.loads(path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def load_playlist(self, playlist_url):
+        return self._read(self._playlist_path(playlist_url))
+
+    def save_playlist(self, playlist_url, entries):
+        self._write(self._playlist_path(playlist_url), entries)
+
+    def load_video(self, video_id):
+        return self._read(self._video_path(video_id))
+
+    def save_video(self, video_id, info):
+        self._write(self._video_path(video_id), info)
+
+def content_hash(video_doc):
+    """Stable hash of the synced fields of a video document"""
+    payload = json.dumps({field: video_doc.get(field) for field in HASHED_FIELDS}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+async def run_ytdlp(args, timeout):
+    """Run yt-dlp without blocking the event loop; returns stdout, or None on failure"""
+    process = await asyncio.create_subprocess_exec(
+        'yt-dlp', *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
     try:
-        # Use yt-dlp to get full video info including descriptions
-        cmd = [
-            'yt-dlp',
-            '--flat-playlist',
-            '--dump-json',
-            '--no-warnings',
-            playlist_url
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-        
-        if result.returncode != 0:
-            print(f"❌ Error fetching playlist: {result.stderr}")
-            return
-        
-        # Parse JSON output (one JSON object per line)
-        videos_data = []
-        for line in result.stdout.strip().split('\n'):
-            if line:
-                try:
-                    video_info = json.loads(line)
-                    videos_data.append(video_info)
-                except json.JSONDecodeError:
-                    continue
-        
-        print(f"✅ Found {len(videos_data)} videos in playlist\n")
-        
-        # Now fetch full details for each video (including description)
-        print("📥 Fetching full video details (descriptions, dates, etc.)...\n")
-        
-        detailed_videos = []
-        for idx, video_info in enumerate(videos_data, 1):
-            video_id = video_info.get('id', '')
-            if not video_id:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise
+    if process.returncode != 0:
+        print(f"    ⚠️  yt-dlp failed: {stderr.decode(errors='replace').strip()[:200]}")
+        return None
+    return stdout.decode()
+
+async def fetch_playlist(playlist_url):
+    """Flat playlist listing: one JSON object per video"""
+    output = await run_ytdlp(['--flat-playlist', '--dump-json', '--no-warnings', playlist_url], timeout=60)
+    if output is None:
+        return None
+
+    # Parse JSON output (one JSON object per line)
+    videos_data = []
+    for line in output.strip().split('\n'):
+        if line:
+            try:
+                videos_data.append(json.loads(line))
+            except json.JSONDecodeError:
                 continue
-            
-            print(f"  [{idx}/{len(videos_data)}] Fetching: {video_info.get('title', 'Unknown')[:60]}...")
-            
-            # Fetch full video details
-            detail_cmd = [
-                'yt-dlp',
-                '--dump-json',
-                '--no-warnings',
-                f"https://www.youtube.com/watch?v={video_id}"
-            ]
-            
+    return videos_data
+
+async def fetch_details(videos_data, workers, cache):
+    """Full details (description, upload date) for every video, `workers` at a time.
+
+    A video whose fetch fails maps to None, so callers can fall back to the
+    cached details rather than the flat playlist entry.
+    """
+    slots = asyncio.Semaphore(workers)
+    done = 0
+
+    async def fetch_one(video_info):
+        nonlocal done
+        video_id = video_info.get('id', '')
+        async with slots:
             try:
-                detail_result = subprocess.run(detail_cmd, capture_output=True, text=True, timeout=30)
-                if detail_result.returncode == 0:
-                    detail_info = json.loads(detail_result.stdout)
-                    detailed_videos.append(detail_info)
+                output = await run_ytdlp(
+                    ['--dump-json', '--no-warnings', f"https://www.youtube.com/watch?v={video_id}"],
+                    timeout=30
+                )
+                if output:
+                    detail_info = json.loads(output)
+                    cache.save_video(video_id, detail_info)
                 else:
-                    # Fallback to basic info if detailed fetch fails
-                    detailed_videos.append(video_info)
+                    detail_info = None
             except Exception as e:
-                print(f"    ⚠️  Could not fetch details: {str(e)}")
-                detailed_videos.append(video_info)
-        
-        print(f"\n✅ Fetched details for {len(detailed_videos)} videos\n")
-        
+                print(f"    ⚠️  Could not fetch details for {video_id}: {str(e) or type(e).__name__}")
+                detail_info = None
+        done += 1
+        print(f"  [{done}/{len(videos_data)}] Fetched: {video_info.get('title', 'Unknown')[:60]}")
+        return detail_info
+
+    # gather keeps the input order
+    return await asyncio.gather(*(fetch_one(info) for info in videos_data))
+
+def build_video_doc(video_info, idx):
+    """Map yt-dlp video info to a video document, or None if it lacks an id or title"""
+    video_id = video_info.get('id', '')
+    title = video_info.get('title', '')
+
+    if not video_id or not title:
+        return None
+
+    # Get FULL description (this is the key improvement!)
+    description = video_info.get('description', '') or ''
+    enriched = enricher.enrich(title, description, default_day=idx)
+    day_number = enriched["day"]
+
+    # Get upload date
+    upload_date = video_info.get('upload_date', '')
+    if upload_date and len(upload_date) == 8:  # Format: YYYYMMDD
+        date_str = f"{upload_date[0:4]}-{upload_date[4:6]}-{upload_date[6:8]}"
+    else:
+        date_str = datetime.utcnow().strftime('%Y-%m-%d')
+
+    # Create reflection from full description or default
+    if description and len(description) > 20:
+        # Use the full YouTube description as reflection
+        reflection = description.strip()
+    else:
+        # Fallback if no description
+        reflection = f"Day {day_number} of my Average2Epic transformation journey. Building consistency, discipline, and becoming the best version of myself."
+
+    return {
+        "title": title,
+        "youtubeId": video_id,
+        "embedUrl": f"https://www.youtube.com/embed/{video_id}",
+        "day": day_number,
+        "date": date_str,
+        "reflection": reflection,  # Full YouTube description!
+        "tags": enriched["tags"],
+        "excerpt": make_excerpt(reflection),
+        "updatedAt": datetime.utcnow()
+    }
+
+def with_content_hash(video_doc):
+    video_doc["contentHash"] = content_hash(video_doc)
+    return video_doc
+
+async def load_sync_state(db, video_ids):
+    """{youtubeId: {contentHash, lastFetchedAt}} for the listed videos already in the database, in one $in lookup"""
+    cursor = db.videos.find(
+        {"youtubeId": {"$in": video_ids}},
+        {"youtubeId": 1, "contentHash": 1, "lastFetchedAt": 1}
+    )
+    return {doc["youtubeId"]: doc async for doc in cursor}
+
+async def upsert_videos(db, video_docs, refetched_ids=(), fetched_at=None):
+    """Write all documents, and the fetch time of unchanged refetched videos, with one unordered bulk write"""
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {"youtubeId": doc["youtubeId"]},
+            {"$set": doc, "$setOnInsert": {"createdAt": now}},
+            upsert=True
+        )
+        for doc in video_docs
+    ]
+    operations += [
+        UpdateOne({"youtubeId": video_id}, {"$set": {"lastFetchedAt": fetched_at}})
+        for video_id in refetched_ids
+    ]
+    if operations:
+        await db.videos.bulk_write(operations, ordered=False)
+
+def rate(count, seconds):
+    return f"{count / seconds:.1f}/s" if seconds > 0 else "n/a"
+
+async def import_playlist_with_descriptions(
+    playlist_url=PLAYLIST_URL,
+    workers=DEFAULT_WORKERS,
+    incremental=False,
+    ttl_hours=DEFAULT_TTL_HOURS,
+    offline=False,
+    dry_run=False,
+    cache_dir=DEFAULT_CACHE_DIR
+):
+    """Import YouTube playlist with full descriptions and update existing videos.
+
+    Incremental mode only fetches details for videos that are new or whose
+    stored lastFetchedAt is older than `ttl_hours`, and only writes videos
+    whose content hash changed (plus the new lastFetchedAt of the rest). Offline mode reads yt-dlp output from the on-disk
+    cache instead of the network; dry runs report without writing.
+    """
+
+    print(f"📺 Fetching playlist with full descriptions...")
+    print(f"🔗 URL: {playlist_url}\n")
+
+    client = None
+    try:
+        started = time.perf_counter()
+        cache = FetchCache(cache_dir)
+
+        # Playlist listing, from yt-dlp or the cache
+        if offline:
+            videos_data = cache.load_playlist(playlist_url)
+            if videos_data is None:
+                print("❌ No cached playlist listing; run once without --offline first")
+                return
+        else:
+            videos_data = await fetch_playlist(playlist_url)
+            if videos_data is None:
+                print("❌ Error fetching playlist")
+                return
+            cache.save_playlist(playlist_url, videos_data)
+
+        # Playlist position is the day-number fallback
+        listed = [(idx, info) for idx, info in enumerate((v for v in videos_data if v.get('id')), 1)]
+        print(f"✅ Found {len(listed)} videos in playlist\n")
+
         # Connect to MongoDB
         mongo_url = os.environ['MONGO_URL']
         client = AsyncIOMotorClient(mongo_url)
         db = client[os.environ['DB_NAME']]
-        
-        imported_count = 0
-        updated_count = 0
-        skipped_count = 0
-        
-        for idx, video_info in enumerate(detailed_videos, 1):
-            try:
-                video_id = video_info.get('id', '')
-                title = video_info.get('title', '')
-                
-                if not video_id or not title:
+        if not dry_run:
+            print(summarize(await ensure_indexes(db)))
+
+        existing = await load_sync_state(db, [info['id'] for _, info in listed])
+
+        # Decide which videos to process. lastFetchedAt is only stored together
+        # with a successful write, so dry runs and failed writes leave videos stale
+        ttl_seconds = ttl_hours * 3600
+        fetched_at = datetime.utcnow()
+        def is_fresh(video_id):
+            last_fetched = existing.get(video_id, {}).get("lastFetchedAt")
+            return last_fetched is not None and (fetched_at - last_fetched).total_seconds() < ttl_seconds
+
+        if incremental:
+            candidates = [(idx, info) for idx, info in listed if not is_fresh(info['id'])]
+        else:
+            candidates = listed
+
+        to_fetch = [] if offline else [info for _, info in candidates]
+
+        print(f"📥 Processing {len(candidates)} of {len(listed)} videos, "
+              f"fetching {len(to_fetch)} with {workers} workers...\n")
+
+        fetch_started = time.perf_counter()
+        fetched = dict(zip((info['id'] for info in to_fetch), await fetch_details(to_fetch, workers, cache)))
+        fetch_seconds = time.perf_counter() - fetch_started
+
+        if to_fetch:
+            print(f"\n✅ Fetched details for {len(fetched)} videos in {fetch_seconds:.1f}s ({rate(len(fetched), fetch_seconds)})\n")
+
+        # Build documents and drop the ones whose content is unchanged
+        video_docs = []
+        # Unchanged videos fetched again: only their lastFetchedAt is written
+        refetched_ids = []
+        unchanged_count = 0
+        kept_count = 0
+        for idx, video_info in candidates:
+            video_id = video_info['id']
+            fetched_now = fetched.get(video_id) is not None
+            detail_info = fetched.get(video_id) or cache.load_video(video_id)
+            if detail_info is None:
+                # The flat entry has no description or upload date; rebuilding an
+                # existing video from it would overwrite the stored reflection
+                if video_id in existing:
+                    print(f"⚠️  No details for {video_id}, keeping the stored video")
+                    kept_count += 1
                     continue
-                
-                # Extract day number from title
-                day_match = re.search(r'[Dd]ay\s*(\d+)', title)
-                day_number = int(day_match.group(1)) if day_match else idx
-                
-                # Get upload date
-                upload_date = video_info.get('upload_date', '')
-                if upload_date and len(upload_date) == 8:  # Format: YYYYMMDD
-                    date_str = f"{upload_date[0:4]}-{upload_date[4:6]}-{upload_date[6:8]}"
-                else:
-                    date_str = datetime.utcnow().strftime('%Y-%m-%d')
-                
-                # Get FULL description (this is the key improvement!)
-                description = video_info.get('description', '')
-                
-                # Create reflection from full description or default
-                if description and len(description) > 20:
-                    # Use the full YouTube description as reflection
-                    reflection = description.strip()
-                else:
-                    # Fallback if no description
-                    reflection = f"Day {day_number} of my Average2Epic transformation journey. Building consistency, discipline, and becoming the best version of myself."
-                
-                # Create excerpt (first 80 chars of reflection)
-                excerpt = reflection[:80] + "..." if len(reflection) > 80 else reflection
-                
-                # Smart tagging based on title and description
-                tags = ["Average2Epic", f"Day {day_number}", "Transformation"]
-                
-                combined_text = (title + " " + description).lower()
-                if any(word in combined_text for word in ['fitness', 'workout', 'gym', 'training', 'exercise']):
-                    tags.append("Fitness")
-                if any(word in combined_text for word in ['morning', 'routine', 'am']):
-                    tags.append("Morning Routine")
-                if any(word in combined_text for word in ['grind', 'discipline', 'consistency', 'hustle']):
-                    tags.append("Discipline")
-                if any(word in combined_text for word in ['mindset', 'mental', 'focus', 'motivation']):
-                    tags.append("Mindset")
-                if any(word in combined_text for word in ['progress', 'update', 'check']):
-                    tags.append("Progress")
-                
-                # Check if video already exists
-                existing = await db.videos.find_one({"youtubeId": video_id})
-                
-                # Create video document
-                video_doc = {
-                    "title": title,
-                    "youtubeId": video_id,
-                    "embedUrl": f"https://www.youtube.com/embed/{video_id}",
-                    "day": day_number,
-                    "date": date_str,
-                    "reflection": reflection,  # Full YouTube description!
-                    "tags": tags,
-                    "excerpt": excerpt,
-                    "updatedAt": datetime.utcnow()
-                }
-                
-                if existing:
-                    # Update existing video with new description
-                    await db.videos.update_one(
-                        {"youtubeId": video_id},
-                        {"$set": video_doc}
-                    )
-                    print(f"✅ Updated: Day {day_number} - {title[:60]}")
-                    updated_count += 1
-                else:
-                    # Insert new video
-                    video_doc["createdAt"] = datetime.utcnow()
-                    await db.videos.insert_one(video_doc)
-                    print(f"✅ Imported: Day {day_number} - {title[:60]}")
-                    imported_count += 1
-                
+                detail_info = video_info
+            try:
+                video_doc = build_video_doc(detail_info, idx)
             except Exception as e:
                 print(f"❌ Error processing video: {str(e)}")
                 continue
-        
-        print(f"\n🎉 Sync Complete!")
-        print(f"✅ New videos imported: {imported_count}")
-        print(f"🔄 Existing videos updated: {updated_count}")
-        print(f"📊 Total videos in playlist: {len(detailed_videos)}")
-        
-        client.close()
-        
-    except subprocess.TimeoutExpired:
+            if not video_doc:
+                continue
+            with_content_hash(video_doc)
+            if fetched_now:
+                video_doc["lastFetchedAt"] = fetched_at
+            if incremental and existing.get(video_id, {}).get("contentHash") == video_doc["contentHash"]:
+                unchanged_count += 1
+                if fetched_now:
+                    refetched_ids.append(video_id)
+                continue
+            video_docs.append(video_doc)
+
+        write_started = time.perf_counter()
+        if not dry_run:
+            await upsert_videos(db, video_docs, refetched_ids, fetched_at)
+        write_seconds = time.perf_counter() - write_started
+        total_seconds = time.perf_counter() - started
+
+        for doc in video_docs:
+            action = "Updated" if doc["youtubeId"] in existing else "Imported"
+            if dry_run:
+                action = f"Would be {action.lower()}"
+            print(f"✅ {action}: Day {doc['day']} - {doc['title'][:60]}")
+
+        updated_count = sum(1 for doc in video_docs if doc["youtubeId"] in existing)
+        imported_count = len(video_docs) - updated_count
+
+        print(f"\n🎉 {'Dry Run' if dry_run else 'Sync'} Complete!")
+        print(f"✅ New videos {'to import' if dry_run else 'imported'}: {imported_count}")
+        print(f"🔄 Existing videos {'to update' if dry_run else 'updated'}: {updated_count}")
+        print(f"⏭️  Unchanged (skipped): {unchanged_count + len(listed) - len(candidates)}")
+        if kept_count:
+            print(f"⚠️  Kept without details: {kept_count}")
+        print(f"📊 Total videos in playlist: {len(listed)}")
+        print(f"⏱️  Fetch: {fetch_seconds:.1f}s ({rate(len(fetched), fetch_seconds)}), "
+              f"write: {write_seconds:.2f}s ({rate(len(video_docs), write_seconds)}), "
+              f"total: {total_seconds:.1f}s ({rate(len(candidates), total_seconds)})")
+
+    except asyncio.TimeoutError:
         print("❌ Timeout: Playlist fetch took too long")
     except Exception as e:
         print(f"❌ Error: {str(e)}")
+    finally:
+        if client is not None:
+            client.close()
 
 if __name__ == "__main__":
-    asyncio.run(import_playlist_with_descriptions())
+    parser = argparse.ArgumentParser(description="Sync the Average2Epic YouTube playlist into MongoDB")
+    parser.add_argument("--playlist", default=PLAYLIST_URL, help="playlist URL")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="concurrent yt-dlp fetches")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only fetch new or stale videos and only write changed ones")
+    parser.add_argument("--ttl-hours", type=float, default=DEFAULT_TTL_HOURS,
+                        help="age of lastFetchedAt after which a video is fetched again (incremental mode)")
+    parser.add_argument("--offline", action="store_true", help="use cached yt-dlp output only")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help="yt-dlp output cache directory")
+    args = parser.parse_args()
+    asyncio.run(import_playlist_with_descriptions(
+        args.playlist,
+        args.workers,
+        incremental=args.incremental,
+        ttl_hours=args.ttl_hours,
+        offline=args.offline,
+        dry_run=args.dry_run,
+        cache_dir=args.cache_dir
+    ))
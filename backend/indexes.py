@@ -0,0 +1,116 @@
+"""
+Index registry for Average2Epic
+
+Every index the app relies on is declared here once. `ensure_indexes` is run
+by server.py on startup and by the import scripts before they write, so a
+fresh database gets the same indexes whichever touches it first. It is
+idempotent: existing indexes are left alone, and a failed build (e.g. a unique
+index over duplicate data) is reported instead of raised.
+
+Run directly to check the indexes of the database in .env:
+    python indexes.py
+"""
+
+import asyncio
+import logging
+from typing import Dict, List
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Names are left to Mongo's default (e.g. "youtubeId_1") so indexes created
+# before the registry existed are recognised as already present
+INDEXES: Dict[str, List[IndexModel]] = {
+    "videos": [
+        # Keyset/page sort on the list endpoint, with and without a tag filter
+        IndexModel([("day", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("tags", ASCENDING), ("day", DESCENDING), ("_id", DESCENDING)]),
+        # Importers look up and upsert by YouTube id
+        IndexModel([("youtubeId", ASCENDING)], unique=True),
+        # /api/videos/search; Mongo allows one text index per collection.
+        # Tags are curated topic labels, so a tag hit outranks a word in the
+        # long reflection. ensure_indexes skips an index whose name exists,
+        # so changing these weights needs the old index dropped first
+        IndexModel(
+            [("title", TEXT), ("reflection", TEXT), ("tags", TEXT)],
+            weights={"title": 10, "tags": 5, "reflection": 1},
+            default_language="english"
+        ),
+    ],
+    "video_related": [
+        # Finds the neighbor lists that contain a changed video
+        IndexModel([("related.id", ASCENDING)]),
+    ],
+    "contacts": [
+        IndexModel([("createdAt", DESCENDING)]),
+    ],
+    "admins": [
+        IndexModel([("username", ASCENDING)], unique=True),
+    ],
+}
+
+# Result of the most recent ensure_indexes run in this process
+last_report: List[dict] = []
+
+
+async def _ensure_collection(db, collection: str, models: List[IndexModel]) -> List[dict]:
+    report = []
+    try:
+        existing = {index["name"] async for index in db[collection].list_indexes()}
+    except PyMongoError:
+        existing = set()
+
+    for model in models:
+        name = model.document["name"]
+        entry = {"collection": collection, "name": name, "unique": model.document.get("unique", False)}
+        if name in existing:
+            entry["status"] = "exists"
+        else:
+            try:
+                await db[collection].create_indexes([model])
+                entry["status"] = "created"
+            except PyMongoError as e:
+                entry["status"] = "failed"
+                entry["error"] = str(e)
+        report.append(entry)
+    return report
+
+
+async def ensure_indexes(db) -> List[dict]:
+    """Create any missing registered index; returns one status entry per index"""
+    results = await asyncio.gather(*(
+        _ensure_collection(db, collection, models) for collection, models in INDEXES.items()
+    ))
+    report = [entry for entries in results for entry in entries]
+
+    last_report[:] = report
+    for entry in report:
+        if entry["status"] == "failed":
+            logger.warning("Index %s.%s not built: %s", entry["collection"], entry["name"], entry["error"])
+    logger.info(summarize(report))
+    return report
+
+
+def summarize(report: List[dict]) -> str:
+    counts = {status: sum(1 for entry in report if entry["status"] == status) for status in ("created", "exists", "failed")}
+    return f"Indexes: {counts['created']} created, {counts['exists']} already present, {counts['failed']} failed"
+
+
+if __name__ == "__main__":
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from dotenv import load_dotenv
+    import os
+    from pathlib import Path
+
+    load_dotenv(Path(__file__).parent / '.env')
+
+    async def main():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        report = await ensure_indexes(client[os.environ['DB_NAME']])
+        for entry in report:
+            print(f"{entry['collection']}.{entry['name']}: {entry['status']} {entry.get('error', '')}".rstrip())
+        print(summarize(report))
+        client.close()
+
+    asyncio.run(main())
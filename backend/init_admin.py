@@ -1,5 +1,6 @@
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
+from indexes import ensure_indexes, summarize
 from utils.auth import hash_password
 from dotenv import load_dotenv
 import os
@@ -13,6 +14,7 @@ async def create_admin():
     mongo_url = os.environ['MONGO_URL']
     client = AsyncIOMotorClient(mongo_url)
     db = client[os.environ['DB_NAME']]
+    print(summarize(await ensure_indexes(db)))
     
     # Check if admin already exists
     existing = await db.admins.find_one({"username": "admin"})
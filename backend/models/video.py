@@ -23,3 +23,11 @@ class VideoCreate(BaseModel):
     date: str
     reflection: str
     tags: List[str]
+
+class EnrichItem(BaseModel):
+    title: str
+    description: Optional[str] = ""
+    day: Optional[int] = None
+
+class EnrichRequest(BaseModel):
+    items: List[EnrichItem]
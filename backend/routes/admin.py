@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException, Depends
 from models.admin import Admin, AdminLogin, AdminToken
-from utils.auth import hash_password, verify_password, create_access_token, verify_token
+from utils.auth import hash_password_async, verify_password_async, create_access_token, verify_token
 from datetime import datetime
 from database import db
 
@@ -16,7 +16,7 @@ async def login(credentials: AdminLogin):
             raise HTTPException(status_code=401, detail="Invalid username or password")
         
         # Verify password
-        if not verify_password(credentials.password, admin["password"]):
+        if not await verify_password_async(credentials.password, admin["password"]):
             raise HTTPException(status_code=401, detail="Invalid username or password")
         
         # Create access token
@@ -51,7 +51,7 @@ async def create_admin(admin: AdminLogin):
             raise HTTPException(status_code=400, detail="Admin already exists")
         
         # Hash password
-        hashed_password = hash_password(admin.password)
+        hashed_password = await hash_password_async(admin.password)
         
         admin_dict = {
             "username": admin.username,
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException
 from models.contact import Contact, ContactCreate
 from datetime import datetime
 from database import db
+from utils.serialization import ORJSONResponse, to_api_many
 
 router = APIRouter(prefix="/api/contact", tags=["contact"])
 
@@ -27,10 +28,6 @@ async def get_contacts():
         cursor = db.contacts.find().sort("createdAt", -1)
         contacts = await cursor.to_list(length=100)
         
-        for contact in contacts:
-            contact["id"] = str(contact["_id"])
-            del contact["_id"]
-        
-        return contacts
+        return ORJSONResponse(to_api_many(contacts))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,26 +1,52 @@
 from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Literal, Optional, Union
 from database import db
-import hashlib
-import secrets
+import indexes
+from utils.counts import video_counts
+from utils.cache import ResponseCache, video_cache
 from datetime import datetime
+from pymongo import DeleteMany, DeleteOne, InsertOne, UpdateMany, UpdateOne, WriteConcern
+from pymongo.errors import BulkWriteError, ExecutionTimeout, OperationFailure
+from bson import ObjectId
+import asyncio
+import os
+import time
+from utils.api_keys import load_key_store
+from utils.rate_limit import RateLimiter, load_rate_limits
+from utils.serialization import ORJSONResponse, dumps
 
 router = APIRouter(prefix="/api/db", tags=["database-api"])
 
-# API Keys for authentication (in production, store these securely)
-API_KEYS = {
-    "average2epic_admin": {
-        "key": hashlib.sha256("Average2Epic_API_Key_2025!".encode()).hexdigest(),
-        "permissions": ["read", "write", "delete"],
-        "description": "Full access to database"
-    },
-    "average2epic_readonly": {
-        "key": hashlib.sha256("Average2Epic_ReadOnly_2025!".encode()).hexdigest(),
-        "permissions": ["read"],
-        "description": "Read-only access"
-    }
-}
+# API users and keys, from DB_API_KEYS_FILE / DB_API_KEYS or the built-in defaults
+api_key_store = load_key_store()
+
+# Per-user token buckets, sized per permission level (DB_API_RATE_LIMITS)
+rate_limiter = RateLimiter(load_rate_limits())
+
+# Documents per network batch and per chunk written in streaming mode
+STREAM_BATCH_SIZE = int(os.environ.get("DB_API_STREAM_BATCH_SIZE", "500"))
+
+# Collection stats are cached briefly; writes through this API drop them
+DB_STATS_CACHE_TTL = float(os.environ.get("DB_STATS_CACHE_TTL", "30"))
+stats_cache = ResponseCache(max_entries=4, ttl=DB_STATS_CACHE_TTL)
+
+# Upper bound on operations in one /bulk request
+MAX_BULK_OPERATIONS = int(os.environ.get("DB_API_MAX_BULK_OPERATIONS", "10000"))
+
+# Non-streaming aggregations return at most this many results
+AGGREGATE_RESULT_LIMIT = 1000
+
+# Query guardrails. Requests may ask for a lower max_time_ms, never a higher
+# one; streaming exports get their own, longer, ceiling.
+MAX_TIME_MS = int(os.environ.get("DB_API_MAX_TIME_MS", "5000"))
+STREAM_MAX_TIME_MS = int(os.environ.get("DB_API_STREAM_MAX_TIME_MS", "300000"))
+MAX_QUERY_LIMIT = int(os.environ.get("DB_API_MAX_LIMIT", "1000"))
+MAX_QUERY_SKIP = int(os.environ.get("DB_API_MAX_SKIP", "10000"))
+# Reject queries whose plan is a collection scan on collections with more
+# documents than this; 0 turns the check off
+REJECT_COLLSCAN_ABOVE = int(os.environ.get("DB_API_REJECT_COLLSCAN_ABOVE", "0"))
 
 # Models
 class QueryRequest(BaseModel):
@@ -30,6 +56,12 @@ class QueryRequest(BaseModel):
     limit: int = 100
     skip: int = 0
     sort: Optional[Dict[str, int]] = None
+    # Stream results as NDJSON; limit 0 then means the whole result
+    stream: bool = False
+    batch_size: Optional[int] = None
+    max_time_ms: Optional[int] = None
+    # Return the query plan and execution stats instead of documents
+    explain: bool = False
 
 class InsertRequest(BaseModel):
     collection: str
@@ -47,6 +79,31 @@ class DeleteRequest(BaseModel):
 class AggregateRequest(BaseModel):
     collection: str
     pipeline: List[Dict[str, Any]]
+    # Stream results as NDJSON, without the non-streaming result limit
+    stream: bool = False
+    batch_size: Optional[int] = None
+    max_time_ms: Optional[int] = None
+
+class BulkOperation(BaseModel):
+    op: Literal["insert", "update", "upsert", "delete"]
+    # insert
+    document: Optional[Dict[str, Any]] = None
+    # update / upsert / delete
+    filter: Dict[str, Any] = {}
+    update: Optional[Dict[str, Any]] = None
+    # Apply update/delete to every match instead of the first
+    multi: bool = False
+
+class WriteConcernOptions(BaseModel):
+    w: Optional[Union[int, str]] = None
+    j: Optional[bool] = None
+    wtimeout: Optional[int] = None
+
+class BulkRequest(BaseModel):
+    collection: str
+    operations: List[BulkOperation]
+    ordered: bool = True
+    write_concern: Optional[WriteConcernOptions] = None
 
 class ConnectionInfo(BaseModel):
     mongo_url: str
@@ -56,33 +113,153 @@ class ConnectionInfo(BaseModel):
 # Authentication
 def verify_api_key(x_api_key: str = Header(...), x_api_user: str = Header(...)):
     """Verify API key authentication"""
-    if x_api_user not in API_KEYS:
-        raise HTTPException(status_code=401, detail="Invalid API user")
-    
-    provided_key = x_api_key
-    expected_key = API_KEYS[x_api_user]["key"]
+    # One answer for unknown users and wrong keys, so users can't be enumerated
+    auth = api_key_store.authenticate(x_api_user, x_api_key)
+    if auth is None:
+        raise HTTPException(status_code=401, detail="Invalid API credentials")
     
-    if provided_key != expected_key:
-        raise HTTPException(status_code=401, detail="Invalid API key")
-    
-    return {
-        "user": x_api_user,
-        "permissions": API_KEYS[x_api_user]["permissions"]
-    }
+    return auth
+
+def invalidate_cached_reads(collection: str):
+    """Drop cached reads affected by a write through this API"""
+    stats_cache.invalidate()
+    if collection == "videos":
+        video_counts.invalidate()
+        video_cache.invalidate()
 
 def check_permission(auth: dict, required_permission: str):
-    """Check if user has required permission"""
+    """Check if user has required permission, and charge it to their rate limit"""
     if required_permission not in auth["permissions"]:
         raise HTTPException(
             status_code=403, 
             detail=f"Permission denied. Required: {required_permission}"
         )
+    
+    retry_after = rate_limiter.check(auth["user"], required_permission)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded for {required_permission} requests",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+async def stream_ndjson(cursor, batch_size: Optional[int]) -> StreamingResponse:
+    """Stream a cursor as newline-delimited JSON, one batch of documents per chunk"""
+    batch_size = batch_size or STREAM_BATCH_SIZE
+    cursor = cursor.batch_size(batch_size)
+    
+    # Pull the first document now so a bad query fails with a proper status code
+    try:
+        first = await cursor.next()
+    except StopAsyncIteration:
+        first = None
+    
+    async def lines():
+        try:
+            if first is None:
+                return
+            chunk = [dumps(first)]
+            async for doc in cursor:
+                if len(chunk) >= batch_size:
+                    yield b"\n".join(chunk) + b"\n"
+                    chunk = []
+                chunk.append(dumps(doc))
+            yield b"\n".join(chunk) + b"\n"
+        finally:
+            await cursor.close()
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def max_time_for(requested: Optional[int], stream: bool = False) -> int:
+    """The server-side time limit for a request, capped at the configured ceiling"""
+    ceiling = STREAM_MAX_TIME_MS if stream else MAX_TIME_MS
+    if requested is None or requested <= 0:
+        return ceiling
+    return min(requested, ceiling)
+
+def enforce_query_limits(request: QueryRequest):
+    """Reject limit/skip values outside the configured bounds"""
+    if request.skip < 0 or request.skip > MAX_QUERY_SKIP:
+        raise HTTPException(
+            status_code=400,
+            detail=f"skip must be between 0 and {MAX_QUERY_SKIP}; use a range filter to page deeper"
+        )
+    if request.stream:
+        if request.limit < 0:
+            raise HTTPException(status_code=400, detail="limit must not be negative")
+    elif request.limit < 1 or request.limit > MAX_QUERY_LIMIT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"limit must be between 1 and {MAX_QUERY_LIMIT}; use stream=true for larger exports"
+        )
+
+def timeout_error(max_time_ms: int) -> HTTPException:
+    return HTTPException(status_code=504, detail=f"Query exceeded the {max_time_ms} ms time limit")
+
+async def explain_find(request: QueryRequest, verbosity: str, max_time_ms: int) -> dict:
+    """Run `explain` for the find a QueryRequest describes"""
+    find = {"find": request.collection, "filter": request.filter, "maxTimeMS": max_time_ms}
+    if request.projection:
+        find["projection"] = request.projection
+    if request.sort:
+        find["sort"] = request.sort
+    if request.skip:
+        find["skip"] = request.skip
+    if request.limit:
+        find["limit"] = request.limit
+    return await db.command({"explain": find, "verbosity": verbosity})
+
+def _plan_stages(plan) -> List[dict]:
+    """Every stage node in an explain plan tree (classic or slot-based engine)"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan)
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(_plan_stages(value))
+    return stages
+
+def summarize_explain(explain: dict) -> dict:
+    winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+    stages = _plan_stages(winning_plan)
+    execution = explain.get("executionStats", {})
+    return {
+        "winning_plan": winning_plan,
+        "stages": [stage["stage"] for stage in stages],
+        "indexes_used": sorted({stage["indexName"] for stage in stages if "indexName" in stage}),
+        "collection_scan": any(stage["stage"] == "COLLSCAN" for stage in stages),
+        "docs_examined": execution.get("totalDocsExamined"),
+        "keys_examined": execution.get("totalKeysExamined"),
+        "n_returned": execution.get("nReturned"),
+        "execution_time_ms": execution.get("executionTimeMillis")
+    }
+
+async def reject_large_collscan(request: QueryRequest, max_time_ms: int):
+    """With DB_API_REJECT_COLLSCAN_ABOVE set, refuse unindexed queries on large collections"""
+    if REJECT_COLLSCAN_ABOVE <= 0:
+        return
+    if await db[request.collection].estimated_document_count() <= REJECT_COLLSCAN_ABOVE:
+        return
+    plan = summarize_explain(await explain_find(request, "queryPlanner", max_time_ms))
+    if plan["collection_scan"]:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Query would scan all of '{request.collection}' "
+                f"(over {REJECT_COLLSCAN_ABOVE} documents); filter or sort on an indexed field"
+            )
+        )
 
 # Endpoints
 
 @router.get("/info")
 async def get_connection_info(auth: dict = Depends(verify_api_key)):
     """Get MongoDB connection information"""
+    check_permission(auth, "read")
+    
     try:
         # Get list of collections
         collections = await db.list_collection_names()
@@ -105,8 +282,20 @@ async def query_collection(
 ):
     """Query documents from a collection"""
     check_permission(auth, "read")
+    enforce_query_limits(request)
+    max_time_ms = max_time_for(request.max_time_ms, request.stream)
     
     try:
+        if request.explain:
+            explain = await explain_find(request, "executionStats", max_time_ms)
+            return {
+                "success": True,
+                "collection": request.collection,
+                "explain": summarize_explain(explain)
+            }
+        
+        await reject_large_collscan(request, max_time_ms)
+        
         collection = db[request.collection]
         
         # Build query
@@ -115,22 +304,25 @@ async def query_collection(
         if request.sort:
             cursor = cursor.sort(list(request.sort.items()))
         
-        cursor = cursor.skip(request.skip).limit(request.limit)
+        cursor = cursor.skip(request.skip).limit(request.limit).max_time_ms(max_time_ms)
+        
+        if request.stream:
+            return await stream_ndjson(cursor, request.batch_size)
         
         # Execute query
         documents = await cursor.to_list(length=request.limit)
         
-        # Convert ObjectId to string
-        for doc in documents:
-            if "_id" in doc:
-                doc["_id"] = str(doc["_id"])
-        
-        return {
+        # ObjectIds and datetimes anywhere in the documents are encoded by orjson
+        return ORJSONResponse({
             "success": True,
             "collection": request.collection,
             "count": len(documents),
             "documents": documents
-        }
+        })
+    except HTTPException:
+        raise
+    except ExecutionTimeout:
+        raise timeout_error(max_time_ms)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -141,10 +333,11 @@ async def count_documents(
 ):
     """Count documents in a collection"""
     check_permission(auth, "read")
+    max_time_ms = max_time_for(request.max_time_ms)
     
     try:
         collection = db[request.collection]
-        count = await collection.count_documents(request.filter)
+        count = await collection.count_documents(request.filter, maxTimeMS=max_time_ms)
         
         return {
             "success": True,
@@ -152,6 +345,8 @@ async def count_documents(
             "count": count,
             "filter": request.filter
         }
+    except ExecutionTimeout:
+        raise timeout_error(max_time_ms)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -170,6 +365,7 @@ async def insert_document(
         request.document["createdAt"] = datetime.utcnow()
         
         result = await collection.insert_one(request.document)
+        invalidate_cached_reads(request.collection)
         
         return {
             "success": True,
@@ -197,6 +393,7 @@ async def update_document(
             request.update["$set"] = {"updatedAt": datetime.utcnow()}
         
         result = await collection.update_many(request.filter, request.update)
+        invalidate_cached_reads(request.collection)
         
         return {
             "success": True,
@@ -218,6 +415,7 @@ async def delete_document(
     try:
         collection = db[request.collection]
         result = await collection.delete_many(request.filter)
+        invalidate_cached_reads(request.collection)
         
         return {
             "success": True,
@@ -227,6 +425,134 @@ async def delete_document(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Permission each bulk op type requires
+BULK_PERMISSIONS = {"insert": "write", "update": "write", "upsert": "write", "delete": "delete"}
+
+def _bulk_request(index: int, operation: BulkOperation, now: datetime) -> tuple:
+    """Translate one bulk op into (pymongo write model, inserted _id or None).
+    
+    Timestamps are stamped like the single-op endpoints do, and inserts get
+    their _id assigned here so it can be reported per op.
+    """
+    if operation.op == "insert":
+        if operation.document is None:
+            raise HTTPException(status_code=400, detail=f"Operation {index}: insert requires 'document'")
+        document = dict(operation.document)
+        document.setdefault("_id", ObjectId())
+        document["createdAt"] = now
+        return InsertOne(document), document["_id"]
+    
+    if operation.op == "delete":
+        model = DeleteMany if operation.multi else DeleteOne
+        return model(operation.filter), None
+    
+    if not operation.update:
+        raise HTTPException(status_code=400, detail=f"Operation {index}: {operation.op} requires 'update'")
+    update = {key: dict(value) if isinstance(value, dict) else value for key, value in operation.update.items()}
+    update.setdefault("$set", {})["updatedAt"] = now
+    upsert = operation.op == "upsert"
+    if upsert:
+        update.setdefault("$setOnInsert", {}).setdefault("createdAt", now)
+    
+    model = UpdateMany if operation.multi else UpdateOne
+    return model(operation.filter, update, upsert=upsert), None
+
+def bulk_response(request: BulkRequest, details: Optional[dict], inserted_ids: dict, elapsed_ms: float) -> dict:
+    """Per-operation results from a bulk_write result or BulkWriteError.details (None when w=0)"""
+    if details is None:
+        # w=0: the server sends nothing back to report
+        return {
+            "success": True,
+            "collection": request.collection,
+            "acknowledged": False,
+            "elapsed_ms": round(elapsed_ms, 2)
+        }
+    
+    errors = {error["index"]: error for error in details.get("writeErrors", [])}
+    write_concern_errors = [error.get("errmsg") for error in details.get("writeConcernErrors", [])]
+    upserted = {entry["index"]: entry["_id"] for entry in details.get("upserted", [])}
+    # An ordered batch stops at its first error
+    stop_at = min(errors) if errors and request.ordered else None
+    
+    results = []
+    for index, operation in enumerate(request.operations):
+        entry = {"index": index, "op": operation.op}
+        if index in errors:
+            entry["status"] = "error"
+            entry["error"] = errors[index].get("errmsg")
+            entry["code"] = errors[index].get("code")
+        elif stop_at is not None and index > stop_at:
+            entry["status"] = "not_executed"
+        else:
+            entry["status"] = "ok"
+            if operation.op == "insert":
+                entry["inserted_id"] = str(inserted_ids[index])
+            elif index in upserted:
+                entry["upserted_id"] = str(upserted[index])
+        results.append(entry)
+    
+    return {
+        "success": not errors and not write_concern_errors,
+        "collection": request.collection,
+        "acknowledged": True,
+        "ordered": request.ordered,
+        "elapsed_ms": round(elapsed_ms, 2),
+        "inserted_count": details.get("nInserted", 0),
+        "matched_count": details.get("nMatched", 0),
+        "modified_count": details.get("nModified", 0),
+        "deleted_count": details.get("nRemoved", 0),
+        "upserted_count": details.get("nUpserted", 0),
+        "error_count": len(errors),
+        "write_concern_errors": write_concern_errors,
+        "results": results
+    }
+
+@router.post("/bulk")
+async def bulk_write(
+    request: BulkRequest,
+    auth: dict = Depends(verify_api_key)
+):
+    """Run a mixed batch of insert/update/upsert/delete operations in one bulk_write"""
+    if not request.operations:
+        raise HTTPException(status_code=400, detail="No operations given")
+    if len(request.operations) > MAX_BULK_OPERATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many operations ({len(request.operations)} > {MAX_BULK_OPERATIONS})"
+        )
+    
+    for permission in sorted({BULK_PERMISSIONS[operation.op] for operation in request.operations}):
+        check_permission(auth, permission)
+    
+    now = datetime.utcnow()
+    requests = []
+    inserted_ids = {}
+    for index, operation in enumerate(request.operations):
+        model, inserted_id = _bulk_request(index, operation, now)
+        requests.append(model)
+        if inserted_id is not None:
+            inserted_ids[index] = inserted_id
+    
+    try:
+        collection = db[request.collection]
+        if request.write_concern:
+            options = request.write_concern.dict(exclude_none=True)
+            collection = collection.with_options(write_concern=WriteConcern(**options))
+        
+        started = time.perf_counter()
+        try:
+            result = await collection.bulk_write(requests, ordered=request.ordered)
+            details = result.bulk_api_result if result.acknowledged else None
+        except BulkWriteError as e:
+            details = e.details
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        invalidate_cached_reads(request.collection)
+        
+        return bulk_response(request, details, inserted_ids, elapsed_ms)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/aggregate")
 async def aggregate_collection(
     request: AggregateRequest,
@@ -234,70 +560,104 @@ async def aggregate_collection(
 ):
     """Run aggregation pipeline on collection"""
     check_permission(auth, "read")
+    max_time_ms = max_time_for(request.max_time_ms, request.stream)
     
     try:
         collection = db[request.collection]
-        cursor = collection.aggregate(request.pipeline)
-        results = await cursor.to_list(length=1000)
+        cursor = collection.aggregate(request.pipeline, maxTimeMS=max_time_ms)
         
-        # Convert ObjectId to string
-        for doc in results:
-            if "_id" in doc:
-                doc["_id"] = str(doc["_id"])
+        if request.stream:
+            return await stream_ndjson(cursor, request.batch_size)
         
-        return {
+        # One extra result tells us whether the response was cut short
+        results = await cursor.to_list(length=AGGREGATE_RESULT_LIMIT + 1)
+        truncated = len(results) > AGGREGATE_RESULT_LIMIT
+        results = results[:AGGREGATE_RESULT_LIMIT]
+        
+        return ORJSONResponse({
             "success": True,
             "collection": request.collection,
             "count": len(results),
+            "truncated": truncated,
             "results": results
-        }
+        })
+    except ExecutionTimeout:
+        raise timeout_error(max_time_ms)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _collection_stats(name: str, exact: bool) -> dict:
+    """Document count plus storage/index sizes for one collection"""
+    collection = db[name]
+    
+    async def storage_stats():
+        try:
+            result = await collection.aggregate(
+                [{"$collStats": {"storageStats": {}}}]
+            ).to_list(length=1)
+            return result[0]["storageStats"] if result else None
+        except OperationFailure:
+            # Views and restricted users don't support $collStats
+            return None
+    
+    if exact:
+        count, storage = await asyncio.gather(collection.count_documents({}), storage_stats())
+    else:
+        storage = await storage_stats()
+        count = storage["count"] if storage else await collection.estimated_document_count()
+    
+    stats = {"name": name, "document_count": count}
+    if storage:
+        stats.update({
+            "size_bytes": storage.get("size", 0),
+            "storage_size_bytes": storage.get("storageSize", 0),
+            "avg_obj_size_bytes": storage.get("avgObjSize", 0),
+            "total_index_size_bytes": storage.get("totalIndexSize", 0),
+            "index_sizes": storage.get("indexSizes", {})
+        })
+    return stats
+
+async def _database_stats(exact: bool) -> List[dict]:
+    collections = await db.list_collection_names()
+    return await asyncio.gather(*(_collection_stats(name, exact) for name in sorted(collections)))
+
+async def cached_database_stats(exact: bool) -> List[dict]:
+    return await stats_cache.get_or_load(("stats", exact), lambda: _database_stats(exact))
+
 @router.get("/collections")
-async def list_collections(auth: dict = Depends(verify_api_key)):
-    """List all collections in database"""
+async def list_collections(exact: bool = False, auth: dict = Depends(verify_api_key)):
+    """List all collections in database (exact=true counts every document)"""
     check_permission(auth, "read")
     
     try:
-        collections = await db.list_collection_names()
-        
-        # Get stats for each collection
-        collection_stats = []
-        for coll_name in collections:
-            count = await db[coll_name].count_documents({})
-            collection_stats.append({
-                "name": coll_name,
-                "document_count": count
-            })
+        collection_stats = await cached_database_stats(exact)
         
         return {
             "success": True,
             "database": db.name,
+            "exact_counts": exact,
             "collections": collection_stats
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/stats")
-async def get_database_stats(auth: dict = Depends(verify_api_key)):
-    """Get database statistics"""
+async def get_database_stats(exact: bool = False, auth: dict = Depends(verify_api_key)):
+    """Get database statistics (exact=true counts every document)"""
     check_permission(auth, "read")
     
     try:
-        collections = await db.list_collection_names()
+        collection_stats = await cached_database_stats(exact)
         
         stats = {
             "database": db.name,
-            "total_collections": len(collections),
-            "collections": {}
-        }
-        
-        for coll_name in collections:
-            count = await db[coll_name].count_documents({})
-            stats["collections"][coll_name] = {
-                "document_count": count
+            "total_collections": len(collection_stats),
+            "exact_counts": exact,
+            "collections": {
+                entry["name"]: {key: value for key, value in entry.items() if key != "name"}
+                for entry in collection_stats
             }
+        }
         
         return {
             "success": True,
@@ -305,3 +665,14 @@ async def get_database_stats(auth: dict = Depends(verify_api_key)):
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/indexes")
+async def get_index_status(auth: dict = Depends(verify_api_key)):
+    """Build status of the registered indexes from the last startup check"""
+    check_permission(auth, "read")
+    
+    return {
+        "success": True,
+        "summary": indexes.summarize(indexes.last_report),
+        "indexes": indexes.last_report
+    }
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+import hmac
+import os
+from utils.cache import video_cache
+from utils.counts import video_counts
+from utils.metrics import render
+from routes.db_api import stats_cache
+
+router = APIRouter(prefix="/api/metrics", tags=["metrics"])
+
+# Bearer token required to scrape, when set
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@router.get("", response_class=PlainTextResponse)
+async def get_metrics(request: Request):
+    """Request, MongoDB, event loop and cache metrics in the Prometheus text format"""
+    if METRICS_TOKEN:
+        supplied = request.headers.get("authorization", "")
+        if not hmac.compare_digest(supplied.encode(), f"Bearer {METRICS_TOKEN}".encode()):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    
+    body = render({
+        "video_responses": video_cache.stats(),
+        "video_counts": video_counts.stats(),
+        "db_stats": stats_cache.stats()
+    })
+    return PlainTextResponse(body, media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import PlainTextResponse
+from utils.auth import verify_token
+from utils.profiling import profile_store
+
+# Only included by server.py when PROFILING_ENABLED is set
+router = APIRouter(prefix="/api/profiles", tags=["profiles"])
+
+@router.get("", response_model=list)
+async def list_profiles(current_user: dict = Depends(verify_token)):
+    """Stored request profiles, newest first"""
+    return profile_store.list()
+
+@router.get("/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    format: str = "speedscope",
+    current_user: dict = Depends(verify_token)
+):
+    """A stored profile as speedscope JSON or collapsed stacks (format=collapsed)"""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    if format == "collapsed":
+        return PlainTextResponse(profile.collapsed())
+    if format == "speedscope":
+        return profile.speedscope()
+    raise HTTPException(status_code=400, detail="format must be speedscope or collapsed")
@@ -1,103 +1,325 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Optional
-from models.video import Video, VideoCreate
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Request
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, List, Optional
+from models.video import Video, VideoCreate, EnrichRequest
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
 from datetime import datetime
+import logging
 import os
 from utils.auth import verify_token
+from utils.pagination import (
+    encode_cursor, decode_cursor, keyset_filter, encode_score_cursor, decode_score_cursor
+)
+from utils.counts import video_counts
+from utils.cache import video_cache, cached_json_response
+from utils.enrichment import enricher, make_excerpt
+from utils.search import search_terms, highlight_pattern, highlight, make_snippet
+from utils.related import RELATED_COUNT, get_related, rebuild_related, refresh_related
+from utils.serialization import to_api, to_api_many
 from database import db
 
 router = APIRouter(prefix="/api/videos", tags=["videos"])
 
+logger = logging.getLogger(__name__)
+
+# Newest day first, _id as tie-breaker so page and cursor mode share one order
+VIDEO_SORT = [("day", -1), ("_id", -1)]
+
+VIDEO_FIELDS = (
+    "title", "youtubeId", "embedUrl", "day", "date", "reflection",
+    "tags", "excerpt", "createdAt", "updatedAt"
+)
+
+# What list cards render; the full reflection is only needed on the detail page
+CARD_FIELDS = (
+    "title", "youtubeId", "embedUrl", "day", "date", "tags", "excerpt",
+    "createdAt", "updatedAt"
+)
+
+# Largest page GET /api/videos serves (the admin dashboard asks for 100)
+MAX_LIST_LIMIT = int(os.environ.get("MAX_LIST_LIMIT", "100"))
+
+MAX_SEARCH_QUERY_LENGTH = 200
+MAX_SEARCH_LIMIT = 50
+
+# Largest batch accepted by POST /enrich
+MAX_ENRICH_ITEMS = int(os.environ.get("MAX_ENRICH_ITEMS", "10000"))
+
+def parse_fields(fields: Optional[str]) -> Optional[tuple]:
+    """Resolve `fields=` to the stored fields to return, or None for whole documents"""
+    if fields is None or fields == "card":
+        return CARD_FIELDS
+    if fields == "full":
+        return None
+    
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(VIDEO_FIELDS) - {"id"}
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    # "day" is always needed to build the next cursor
+    return tuple(field for field in VIDEO_FIELDS if field in requested or field == "day")
+
+def projection_for(selected: Optional[tuple]) -> dict:
+    """Explicit projection, so sync bookkeeping (contentHash, lastFetchedAt) is never returned"""
+    return {field: 1 for field in (VIDEO_FIELDS if selected is None else selected)}
+
+def invalidate_video_reads(video_id: Optional[str] = None):
+    """Drop cached list/tag responses (and one video's) after a write"""
+    video_cache.invalidate("list", "tags", "search")
+    if video_id is not None:
+        video_cache.discard(("video", video_id))
+
+async def refresh_related_videos(video_id: str):
+    """Background task: update the neighbor lists a write affected"""
+    try:
+        await refresh_related(db, video_id)
+        video_cache.invalidate("related")
+    except Exception:
+        logger.exception("Related-video refresh failed for %s", video_id)
+
 @router.get("", response_model=dict)
 async def get_videos(
+    request: Request,
     page: int = 1,
     limit: int = 12,
-    tag: Optional[str] = None
+    tag: Optional[str] = None,
+    after: Optional[str] = None,
+    fields: Optional[str] = None
 ):
     try:
-        skip = (page - 1) * limit
-        
-        # Build query
-        query = {}
-        if tag and tag != "All":
-            query["tags"] = tag
-        
-        # Get total count
-        total = await db.videos.count_documents(query)
-        
-        # Get videos
-        cursor = db.videos.find(query).sort("day", -1).skip(skip).limit(limit)
-        videos = await cursor.to_list(length=limit)
+        if not 1 <= limit <= MAX_LIST_LIMIT:
+            raise HTTPException(status_code=400, detail=f"limit must be 1-{MAX_LIST_LIMIT}")
+        if page < 1:
+            raise HTTPException(status_code=400, detail="page must be 1 or more")
+        selected = parse_fields(fields)
+        return await cached_json_response(
+            video_cache,
+            request,
+            ("list", page, limit, tag, after, selected),
+            lambda: _load_videos(page, limit, tag, after, projection_for(selected))
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _load_videos(
+    page: int,
+    limit: int,
+    tag: Optional[str],
+    after: Optional[str],
+    projection: dict
+) -> dict:
+    # Build query
+    query = {}
+    if tag and tag != "All":
+        query["tags"] = tag
+    
+    # Cursor mode: seek past the last seen (day, _id) instead of skipping
+    if after is not None:
+        if after:
+            query.update(keyset_filter(*decode_cursor(after)))
         
-        # Convert ObjectId to string
-        for video in videos:
-            video["id"] = str(video["_id"])
-            del video["_id"]
+        cursor = db.videos.find(query, projection).sort(VIDEO_SORT).limit(limit + 1)
+        videos = await cursor.to_list(length=limit + 1)
         
-        total_pages = (total + limit - 1) // limit
+        has_next = len(videos) > limit
+        videos = videos[:limit]
+        next_cursor = encode_cursor(videos[-1]["day"], videos[-1]["_id"]) if has_next else None
         
         return {
-            "videos": videos,
+            "videos": to_api_many(videos),
             "pagination": {
-                "currentPage": page,
-                "totalPages": total_pages,
-                "totalVideos": total,
-                "hasNext": page < total_pages,
-                "hasPrev": page > 1
+                "limit": limit,
+                "nextCursor": next_cursor,
+                "hasNext": has_next
             }
         }
+    
+    skip = (page - 1) * limit
+    
+    # Get total count (cached per tag, kept current by the write handlers)
+    total = await video_counts.get(query.get("tags"))
+    
+    # Get videos
+    cursor = db.videos.find(query, projection).sort(VIDEO_SORT).skip(skip).limit(limit)
+    videos = await cursor.to_list(length=limit)
+    
+    total_pages = (total + limit - 1) // limit
+    
+    return {
+        "videos": to_api_many(videos),
+        "pagination": {
+            "currentPage": page,
+            "totalPages": total_pages,
+            "totalVideos": total,
+            "hasNext": page < total_pages,
+            "hasPrev": page > 1
+        }
+    }
+
+# Declared before /{video_id} so "search" isn't taken for an id
+@router.get("/search", response_model=dict)
+async def search_videos(
+    request: Request,
+    q: str,
+    limit: int = 12,
+    tag: Optional[str] = None,
+    after: Optional[str] = None
+):
+    """Full-text search over title, reflection and tags, best match first"""
+    try:
+        query = " ".join(q.split())
+        if not query or len(query) > MAX_SEARCH_QUERY_LENGTH:
+            raise HTTPException(
+                status_code=400,
+                detail=f"q must be 1-{MAX_SEARCH_QUERY_LENGTH} characters"
+            )
+        if not 1 <= limit <= MAX_SEARCH_LIMIT:
+            raise HTTPException(status_code=400, detail=f"limit must be 1-{MAX_SEARCH_LIMIT}")
+        
+        return await cached_json_response(
+            video_cache,
+            request,
+            ("search", query, limit, tag, after),
+            lambda: _search_videos(query, limit, tag, after)
+        )
+    except HTTPException:
+        raise
+    except OperationFailure as e:
+        # IndexNotFound: the text index hasn't been built yet
+        if e.code == 27:
+            raise HTTPException(status_code=503, detail="Search index is not ready")
+        raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _search_videos(query: str, limit: int, tag: Optional[str], after: Optional[str]) -> dict:
+    match = {"$text": {"$search": query}}
+    if tag and tag != "All":
+        match["tags"] = tag
+    
+    pipeline = [
+        {"$match": match},
+        {"$addFields": {"score": {"$meta": "textScore"}}}
+    ]
+    # Keyset on (score, _id), the same seek as the list endpoint's (day, _id)
+    if after:
+        pipeline.append({"$match": keyset_filter(*decode_score_cursor(after), field="score")})
+    pipeline += [
+        {"$sort": {"score": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        # The reflection is only read to build the snippet
+        {"$project": {**projection_for(CARD_FIELDS), "reflection": 1, "score": 1}}
+    ]
+    
+    videos = await db.videos.aggregate(pipeline).to_list(length=limit + 1)
+    has_next = len(videos) > limit
+    videos = videos[:limit]
+    next_cursor = encode_score_cursor(videos[-1]["score"], videos[-1]["_id"]) if has_next else None
+    
+    pattern = highlight_pattern(search_terms(query))
+    for video in to_api_many(videos):
+        video["titleHighlight"] = highlight(video.get("title", ""), pattern)
+        video["snippet"] = make_snippet(video.pop("reflection", "") or video.get("excerpt") or "", pattern)
+    
+    return {
+        "videos": videos,
+        "pagination": {
+            "limit": limit,
+            "nextCursor": next_cursor,
+            "hasNext": has_next
+        }
+    }
+
 @router.get("/{video_id}", response_model=Video)
-async def get_video(video_id: str):
+async def get_video(video_id: str, request: Request):
     try:
         from bson import ObjectId
-        video = await db.videos.find_one({"_id": ObjectId(video_id)})
-        if not video:
-            raise HTTPException(status_code=404, detail="Video not found")
         
-        video["id"] = str(video["_id"])
-        del video["_id"]
-        return video
+        async def load():
+            video = await db.videos.find_one({"_id": ObjectId(video_id)}, projection_for(None))
+            if not video:
+                raise HTTPException(status_code=404, detail="Video not found")
+            
+            return to_api(video)
+        
+        return await cached_json_response(video_cache, request, ("video", video_id), load)
     except Exception as e:
         raise HTTPException(status_code=404, detail="Video not found")
 
+@router.get("/{video_id}/related", response_model=dict)
+async def get_related_videos(video_id: str, request: Request, limit: int = RELATED_COUNT):
+    """Precomputed nearest neighbors of a video, most similar first"""
+    try:
+        from bson import ObjectId
+        object_id = ObjectId(video_id)
+    except Exception:
+        raise HTTPException(status_code=404, detail="Video not found")
+    if not 1 <= limit <= RELATED_COUNT:
+        raise HTTPException(status_code=400, detail=f"limit must be 1-{RELATED_COUNT}")
+    
+    async def load():
+        related = await get_related(db, object_id, limit)
+        # Not built yet (e.g. imported by a script); empty until the next refresh or rebuild
+        return {"videos": related or []}
+    
+    return await cached_json_response(video_cache, request, ("related", video_id, limit), load)
+
+@router.post("/related/rebuild", response_model=dict)
+async def rebuild_related_videos(current_user: dict = Depends(verify_token)):
+    """Recompute every video's neighbor list from scratch"""
+    try:
+        result = await rebuild_related(db)
+        video_cache.invalidate("related")
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("", response_model=Video)
 async def create_video(
     video: VideoCreate,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(verify_token)
 ):
     try:
-        # Create excerpt from reflection
-        excerpt = video.reflection[:80] + "..." if len(video.reflection) > 80 else video.reflection
-        
         video_dict = video.dict()
-        video_dict["excerpt"] = excerpt
+        video_dict["excerpt"] = make_excerpt(video.reflection)
         video_dict["createdAt"] = datetime.utcnow()
         video_dict["updatedAt"] = datetime.utcnow()
         
         result = await db.videos.insert_one(video_dict)
+        video_counts.record_insert(video_dict["tags"])
+        invalidate_video_reads()
+        background_tasks.add_task(refresh_related_videos, str(result.inserted_id))
         
         created_video = await db.videos.find_one({"_id": result.inserted_id})
-        created_video["id"] = str(created_video["_id"])
-        del created_video["_id"]
-        
-        return created_video
+        return to_api(created_video)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/{video_id}")
 async def delete_video(
     video_id: str,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(verify_token)
 ):
     try:
         from bson import ObjectId
-        result = await db.videos.delete_one({"_id": ObjectId(video_id)})
-        if result.deleted_count == 0:
+        deleted = await db.videos.find_one_and_delete(
+            {"_id": ObjectId(video_id)},
+            projection={"tags": 1}
+        )
+        if deleted is None:
             raise HTTPException(status_code=404, detail="Video not found")
+        video_counts.record_delete(deleted.get("tags", []))
+        invalidate_video_reads(video_id)
+        background_tasks.add_task(refresh_related_videos, video_id)
         return {"success": True, "message": "Video deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -106,39 +328,73 @@ async def delete_video(
 async def update_video(
     video_id: str,
     video: VideoCreate,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(verify_token)
 ):
     try:
         from bson import ObjectId
         
-        # Create excerpt from reflection
-        excerpt = video.reflection[:80] + "..." if len(video.reflection) > 80 else video.reflection
-        
         video_dict = video.dict()
-        video_dict["excerpt"] = excerpt
+        video_dict["excerpt"] = make_excerpt(video.reflection)
         video_dict["updatedAt"] = datetime.utcnow()
         
-        result = await db.videos.update_one(
+        # Previous version is needed to move the tag counts
+        previous = await db.videos.find_one_and_update(
             {"_id": ObjectId(video_id)},
-            {"$set": video_dict}
+            {"$set": video_dict},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.matched_count == 0:
+        if previous is None:
             raise HTTPException(status_code=404, detail="Video not found")
+        video_counts.record_update(previous.get("tags", []), video_dict["tags"])
+        invalidate_video_reads(video_id)
+        background_tasks.add_task(refresh_related_videos, video_id)
         
-        updated_video = await db.videos.find_one({"_id": ObjectId(video_id)})
-        updated_video["id"] = str(updated_video["_id"])
-        del updated_video["_id"]
-        
-        return updated_video
+        return to_api({**previous, **video_dict})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/tags/all", response_model=List[str])
-async def get_all_tags():
+async def get_all_tags(request: Request):
+    try:
+        async def load():
+            # Get all unique tags
+            tags = await db.videos.distinct("tags")
+            return ["All"] + sorted(tags)
+        
+        return await cached_json_response(video_cache, request, ("tags",), load)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/tags/counts", response_model=Dict[str, int])
+async def get_tag_counts(request: Request):
+    """Video count per tag, with the overall total under the "All" key"""
     try:
-        # Get all unique tags
-        tags = await db.videos.distinct("tags")
-        return ["All"] + sorted(tags)
+        return await cached_json_response(video_cache, request, ("tags", "counts"), video_counts.all_counts)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/enrich", response_model=dict)
+async def enrich_videos(
+    request: EnrichRequest,
+    current_user: dict = Depends(verify_token)
+):
+    """Day, tags and excerpt for a batch of titles/descriptions, using the importers' rules"""
+    if len(request.items) > MAX_ENRICH_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_ENRICH_ITEMS} items per request"
+        )
+    items = [item.dict() for item in request.items]
+    # One regex pass per item, off the event loop for large batches
+    results = await run_in_threadpool(enricher.enrich_many, items)
+    return {"count": len(results), "results": results}
+
+@router.get("/cache/stats", response_model=dict)
+async def get_cache_stats(current_user: dict = Depends(verify_token)):
+    """Hit/miss counters for the public read caches"""
+    return {
+        "responses": video_cache.stats(),
+        "counts": video_counts.stats()
+    }
@@ -1,20 +1,39 @@
 from fastapi import FastAPI, APIRouter
+from contextlib import asynccontextmanager, suppress
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+import asyncio
 import os
 import logging
 from pathlib import Path
 
 # Import routes
 from routes import videos, contact, admin
-from routes import db_api
-from database import client
+from routes import db_api, metrics
+import database
+from database import db
+from indexes import ensure_indexes
+from utils.metrics import MetricsMiddleware, monitor_event_loop_lag
+from utils import profiling
+from utils.compression import CompressionMiddleware
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Connect and warm the pool before taking traffic, then make sure indexes exist
+    if await database.connect():
+        await ensure_indexes(db)
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    yield
+    lag_monitor.cancel()
+    with suppress(asyncio.CancelledError):
+        await lag_monitor
+    database.close()
+
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix for basic routes
 api_router = APIRouter(prefix="/api")
@@ -32,6 +51,13 @@ app.include_router(videos.router)
 app.include_router(contact.router)
 app.include_router(admin.router)
 app.include_router(db_api.router)
+app.include_router(metrics.router)
+
+# Request profiling is opt-in; when disabled neither the middleware nor its routes exist
+if profiling.PROFILING_ENABLED:
+    from routes import profiles
+    app.include_router(profiles.router)
+    app.add_middleware(profiling.ProfilingMiddleware, api_key_store=db_api.api_key_store)
 
 app.add_middleware(
     CORSMiddleware,
@@ -41,13 +67,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compresses everything not already compressed (cached video responses keep their compressed variants)
+app.add_middleware(CompressionMiddleware)
+
+# Outermost, so its timings include CORS handling and its sizes are bytes on the wire
+app.add_middleware(MetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
@@ -0,0 +1,76 @@
+import hashlib
+import hmac
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+# Built-in keys, used when neither DB_API_KEYS_FILE nor DB_API_KEYS is set
+DEFAULT_API_KEYS = {
+    "average2epic_admin": {
+        "key": "Average2Epic_API_Key_2025!",
+        "permissions": ["read", "write", "delete"],
+        "description": "Full access to database"
+    },
+    "average2epic_readonly": {
+        "key": "Average2Epic_ReadOnly_2025!",
+        "permissions": ["read"],
+        "description": "Read-only access"
+    }
+}
+
+
+def _digest(value: str) -> bytes:
+    return hashlib.sha256(value.encode()).digest()
+
+
+class APIKeyStore:
+    """API users for /api/db, holding only SHA-256 digests of their keys.
+
+    Entries map a user name to {"key": "<secret>"} or {"key_sha256": "<hex>"}
+    plus "permissions" and an optional "description".
+    """
+
+    def __init__(self, entries: Dict[str, dict], accept_digest_as_key: bool = False):
+        self._users = {}
+        for user, entry in entries.items():
+            if "key_sha256" in entry:
+                digest = bytes.fromhex(entry["key_sha256"])
+            else:
+                digest = _digest(entry["key"])
+            self._users[user] = {
+                "digest": digest,
+                # Older clients of the built-in keys send the hex digest itself
+                "legacy_key": digest.hex().encode() if accept_digest_as_key else None,
+                "permissions": list(entry.get("permissions", [])),
+                "description": entry.get("description", "")
+            }
+        # Compared against for unknown users so every lookup does the same work
+        self._dummy_digest = _digest(os.urandom(16).hex())
+
+    def __contains__(self, user: str) -> bool:
+        return user in self._users
+
+    def authenticate(self, user: str, key: str) -> Optional[dict]:
+        """Return {"user", "permissions"} when `key` is valid for `user`, else None"""
+        entry = self._users.get(user)
+        expected = entry["digest"] if entry else self._dummy_digest
+        valid = hmac.compare_digest(_digest(key), expected)
+
+        if entry and entry["legacy_key"] is not None:
+            valid = hmac.compare_digest(key.encode(), entry["legacy_key"]) or valid
+
+        if entry is None or not valid:
+            return None
+        return {"user": user, "permissions": entry["permissions"]}
+
+
+def load_key_store() -> APIKeyStore:
+    """Keys from DB_API_KEYS_FILE (JSON file), else DB_API_KEYS (JSON string), else the defaults"""
+    keys_file = os.environ.get("DB_API_KEYS_FILE")
+    if keys_file:
+        return APIKeyStore(json.loads(Path(keys_file).read_text()))
+    keys_json = os.environ.get("DB_API_KEYS")
+    if keys_json:
+        return APIKeyStore(json.loads(keys_json))
+    return APIKeyStore(DEFAULT_API_KEYS, accept_digest_as_key=True)
@@ -1,4 +1,8 @@
+import asyncio
 import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -8,11 +12,25 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt takes ~100-300 ms of CPU per call, so request handlers run it on a
+# small dedicated pool instead of the event loop. At most
+# PASSWORD_HASH_MAX_PENDING calls may be queued or running; beyond that new
+# attempts are turned away rather than piling up behind each other.
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", "16"))
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = asyncio.Semaphore(PASSWORD_HASH_MAX_PENDING)
+
 # JWT settings
 SECRET_KEY = os.environ.get("JWT_SECRET", "average2epic-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_DAYS = 30
 
+# Recently verified tokens, so repeated admin calls skip re-decoding
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "256"))
+_token_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
 security = HTTPBearer()
 
 def hash_password(password: str) -> str:
@@ -21,6 +39,25 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+async def _run_hashing(func, *args):
+    if _hash_slots.locked():
+        raise HTTPException(
+            status_code=503,
+            detail="Too many concurrent authentication requests",
+            headers={"Retry-After": "1"}
+        )
+    async with _hash_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, func, *args)
+
+async def hash_password_async(password: str) -> str:
+    """hash_password without blocking the event loop"""
+    return await _run_hashing(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password without blocking the event loop"""
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
@@ -28,13 +65,30 @@ def create_access_token(data: dict) -> str:
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Security(security)) -> dict:
+def decode_token(token: str) -> dict:
+    """Verify a JWT and return the current user, using the verified-token cache"""
+    cached = _token_cache.get(token)
+    if cached is not None:
+        user, expires_at = cached
+        if expires_at > time.time():
+            _token_cache.move_to_end(token)
+            return dict(user)
+        del _token_cache[token]
+
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        return {"username": username}
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
+    username: str = payload.get("sub")
+    if username is None:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
+    user = {"username": username}
+    _token_cache[token] = (user, payload.get("exp", time.time()))
+    while len(_token_cache) > TOKEN_CACHE_SIZE:
+        _token_cache.popitem(last=False)
+    return dict(user)
+
+async def verify_token(credentials: HTTPAuthorizationCredentials = Security(security)) -> dict:
+    return decode_token(credentials.credentials)
@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Tuple
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+from utils.serialization import dumps
+from utils.compression import SUPPORTED_ENCODINGS, compress, encoded_etag, negotiate, worth_compressing
+
+VIDEO_CACHE_MAX_ENTRIES = int(os.environ.get("VIDEO_CACHE_MAX_ENTRIES", "512"))
+VIDEO_CACHE_TTL = float(os.environ.get("VIDEO_CACHE_TTL", "60"))
+
+# "no-cache" lets browsers and CDNs keep the body but revalidate via ETag on
+# every use, so admin edits show up immediately; raise max-age/s-maxage to
+# let them skip the round-trip entirely
+VIDEO_CACHE_CONTROL = os.environ.get("VIDEO_CACHE_CONTROL", "public, no-cache")
+
+
+class ResponseCache:
+    """Bounded LRU cache with a TTL for read-only route responses.
+
+    Keys are tuples whose first element names the route, so writers can drop
+    one route's entries at a time. Concurrent misses on the same key share a
+    single load. A ttl of 0 or less disables the cache: every call loads.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        # Bumped on invalidation so loads that started before it are not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_load(self, key: Tuple[Hashable, ...], loader: Callable[[], Awaitable[Any]]) -> Any:
+        if self.ttl <= 0:
+            self.misses += 1
+            return await loader()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            generation = self._generation
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done, generation))
+        else:
+            self.coalesced += 1
+
+        # Shielded so one cancelled request does not cancel the load for the others
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Tuple, task: asyncio.Future, generation: int):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if generation == self._generation:
+            self._set(key, task.result())
+
+    def _set(self, key: Tuple, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, *routes: str):
+        """Drop entries for the given routes, or everything when none are given"""
+        self._generation += 1
+        if not routes:
+            self._entries.clear()
+            self._inflight.clear()
+            return
+        for store in (self._entries, self._inflight):
+            for key in [key for key in store if key[0] in routes]:
+                del store[key]
+
+    def discard(self, key: Tuple[Hashable, ...]):
+        """Drop a single entry"""
+        self._generation += 1
+        self._entries.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "ttlSeconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hitRatio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class CachedBody(NamedTuple):
+    """A serialized JSON response body, its strong ETag and its compressed variants"""
+    body: bytes
+    etag: str
+    # Encoding -> compressed body, filled on the first request for each encoding
+    encoded: Dict[str, bytes]
+
+    def etags(self) -> Tuple[str, ...]:
+        """The ETag of every representation; all describe the same content"""
+        if not worth_compressing(self.body):
+            return (self.etag,)
+        return (self.etag,) + tuple(encoded_etag(self.etag, encoding) for encoding in SUPPORTED_ENCODINGS)
+
+
+def encode_body(payload: Any) -> CachedBody:
+    """Serialize with orjson and tag the bytes with a content hash"""
+    body = dumps(payload)
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    return CachedBody(body, etag, {})
+
+
+async def encoded_variant(cached: CachedBody, encoding: str) -> bytes:
+    """`cached.body` in `encoding`, compressed once off the event loop and kept with the entry"""
+    variant = cached.encoded.get(encoding)
+    if variant is None:
+        # Concurrent first requests may both compress; the results are identical
+        variant = await run_in_threadpool(compress, cached.body, encoding, True)
+        cached.encoded[encoding] = variant
+    return variant
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag[2:] == etag if tag.startswith("W/") else tag == etag for tag in candidates)
+
+
+async def cached_json_response(
+    cache: ResponseCache,
+    request: Request,
+    key: Tuple[Hashable, ...],
+    loader: Callable[[], Awaitable[Any]],
+    cache_control: str = VIDEO_CACHE_CONTROL
+) -> Response:
+    """Serve `loader()` from `cache` as JSON, answering 304 when the client's copy is current"""
+    async def load() -> CachedBody:
+        return encode_body(await loader())
+
+    cached = await cache.get_or_load(key, load)
+
+    encoding = negotiate(request.headers.get("accept-encoding")) if worth_compressing(cached.body) else None
+    etag = encoded_etag(cached.etag, encoding) if encoding else cached.etag
+    headers = {"Cache-Control": cache_control, "Vary": "Accept-Encoding", "ETag": etag}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and any(etag_matches(if_none_match, candidate) for candidate in cached.etags()):
+        return Response(status_code=304, headers=headers)
+
+    if encoding is None or cache.ttl <= 0:
+        # With the cache disabled nothing is kept, so the compression middleware
+        # compresses (and suffixes the ETag) at its cheaper per-request level
+        headers["ETag"] = cached.etag
+        return Response(content=cached.body, media_type="application/json", headers=headers)
+
+    # The stored variant is served as is; the compression middleware leaves it alone
+    headers["Content-Encoding"] = encoding
+    body = await encoded_variant(cached, encoding)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Public video reads: "list", "video" and "tags" routes
+video_cache = ResponseCache(VIDEO_CACHE_MAX_ENTRIES, VIDEO_CACHE_TTL)
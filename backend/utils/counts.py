@@ -0,0 +1,142 @@
+import os
+import time
+from typing import Dict, Iterable, Optional
+from database import db
+
+ALL = "All"
+
+# Upper bound on how long a count may be served without re-counting, which
+# also bounds staleness from writers outside this process (import scripts)
+VIDEO_COUNT_CACHE_TTL = float(os.environ.get("VIDEO_COUNT_CACHE_TTL", "300"))
+
+
+class CountCache:
+    """Per-tag document counts (plus the "All" total), kept current by the write handlers"""
+
+    def __init__(self, collection, field: str, ttl: float):
+        self.collection = collection
+        self.field = field
+        self.ttl = ttl
+        self._counts: Dict[str, int] = {}
+        self._loaded_at: Dict[str, float] = {}
+        # Set when every tag was loaded at once, so unknown tags count as zero
+        self._complete_at: Optional[float] = None
+        # Bumped on every write so a count that raced a write is not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _is_fresh(self, key: str) -> bool:
+        loaded_at = self._loaded_at.get(key)
+        return loaded_at is not None and time.monotonic() - loaded_at < self.ttl
+
+    def _is_complete(self) -> bool:
+        return self._complete_at is not None and time.monotonic() - self._complete_at < self.ttl
+
+    def _store(self, key: str, count: int):
+        self._counts[key] = count
+        self._loaded_at[key] = time.monotonic()
+
+    async def get(self, tag: Optional[str] = None) -> int:
+        """Count of documents carrying `tag`, or of all documents"""
+        key = tag or ALL
+        if self._is_fresh(key):
+            self.hits += 1
+            return self._counts[key]
+        if key not in self._counts and self._is_complete():
+            self.hits += 1
+            return 0
+
+        self.misses += 1
+        generation = self._generation
+        query = {} if key == ALL else {self.field: key}
+        count = await self.collection.count_documents(query)
+
+        if generation == self._generation:
+            self._store(key, count)
+        return count
+
+    async def all_counts(self) -> Dict[str, int]:
+        """Counts for every tag plus the "All" total, from one aggregation"""
+        if not self._is_complete():
+            generation = self._generation
+            pipeline = [
+                {"$facet": {
+                    "total": [{"$count": "count"}],
+                    "tags": [
+                        # Dedupe per document so a repeated tag is counted once
+                        {"$project": {"tag": {"$setUnion": [f"${self.field}", []]}}},
+                        {"$unwind": "$tag"},
+                        {"$group": {"_id": "$tag", "count": {"$sum": 1}}}
+                    ]
+                }}
+            ]
+            result = await self.collection.aggregate(pipeline).to_list(length=1)
+            facets = result[0] if result else {"total": [], "tags": []}
+
+            if generation != self._generation:
+                # A write landed mid-aggregation; answer from it but keep nothing
+                return self._format(facets)
+
+            self._counts.clear()
+            self._loaded_at.clear()
+            for key, count in self._format(facets).items():
+                self._store(key, count)
+            self._complete_at = time.monotonic()
+
+        counts = {tag: count for tag, count in self._counts.items() if tag != ALL and count > 0}
+        return {ALL: self._counts.get(ALL, 0), **dict(sorted(counts.items()))}
+
+    @staticmethod
+    def _format(facets: dict) -> Dict[str, int]:
+        total = facets["total"][0]["count"] if facets["total"] else 0
+        counts = {entry["_id"]: entry["count"] for entry in facets["tags"] if entry["_id"] != ALL}
+        return {ALL: total, **dict(sorted(counts.items()))}
+
+    def record_insert(self, tags: Iterable[str]):
+        self._adjust(tags, 1)
+
+    def record_delete(self, tags: Iterable[str]):
+        self._adjust(tags, -1)
+
+    def record_update(self, old_tags: Iterable[str], new_tags: Iterable[str]):
+        self._generation += 1
+        old, new = set(old_tags) - {ALL}, set(new_tags) - {ALL}
+        for tag in old - new:
+            self._bump(tag, -1)
+        for tag in new - old:
+            self._bump(tag, 1)
+
+    def invalidate(self):
+        """Drop everything, for writes whose effect on counts is unknown"""
+        self._generation += 1
+        self._counts.clear()
+        self._loaded_at.clear()
+        self._complete_at = None
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._counts),
+            "complete": self._is_complete(),
+            "ttlSeconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def _adjust(self, tags: Iterable[str], delta: int):
+        self._generation += 1
+        self._bump(ALL, delta)
+        for tag in set(tags) - {ALL}:
+            self._bump(tag, delta)
+
+    def _bump(self, key: str, delta: int):
+        # Only counts already cached are adjusted; anything else is loaded on
+        # demand, unless the full tag set is cached and this is a new tag
+        if key in self._counts:
+            self._counts[key] = max(0, self._counts[key] + delta)
+        elif self._is_complete():
+            self._counts[key] = max(0, delta)
+            self._loaded_at[key] = self._complete_at
+
+
+video_counts = CountCache(db.videos, "tags", VIDEO_COUNT_CACHE_TTL)
@@ -0,0 +1,110 @@
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence
+
+# Tag -> keywords; a video gets the tag when any keyword occurs anywhere in
+# its (lowercased) title or description
+DEFAULT_TAG_RULES = {
+    "Fitness": ["fitness", "workout", "gym", "training", "exercise"],
+    "Morning Routine": ["morning", "routine", "am"],
+    "Discipline": ["grind", "discipline", "consistency", "hustle"],
+    "Mindset": ["mindset", "mental", "focus", "motivation"],
+    "Progress": ["progress", "update", "check"]
+}
+
+BASE_TAGS = ("Average2Epic", "Transformation")
+
+EXCERPT_LENGTH = 80
+
+DAY_PATTERN = re.compile(r'[Dd]ay\s*(\d+)')
+
+
+def extract_day(title: str, default: int) -> int:
+    """Day number from a "Day 12"-style title, else `default`"""
+    match = DAY_PATTERN.search(title)
+    return int(match.group(1)) if match else default
+
+
+def make_excerpt(text: str, length: int = EXCERPT_LENGTH) -> str:
+    return text[:length] + "..." if len(text) > length else text
+
+
+class Enricher:
+    """Tags text against a rule table with one precompiled regex.
+
+    All keywords are joined into a single alternation inside a lookahead, so
+    one scan finds every (possibly overlapping) keyword occurrence. Longer
+    keywords are tried first and carry the tags of any keyword that is a
+    prefix of them, which keeps the result identical to a substring test per
+    keyword.
+    """
+
+    def __init__(self, rules: Dict[str, Sequence[str]]):
+        self.tags = list(rules)
+        keyword_tags: Dict[str, set] = {}
+        for tag, keywords in rules.items():
+            for keyword in keywords:
+                keyword_tags.setdefault(keyword.lower(), set()).add(tag)
+
+        self._tags_for: Dict[str, frozenset] = {
+            keyword: frozenset().union(*(
+                tags for other, tags in keyword_tags.items() if keyword.startswith(other)
+            ))
+            for keyword in keyword_tags
+        }
+        alternatives = sorted(keyword_tags, key=len, reverse=True)
+        self._pattern = re.compile(
+            "(?=(" + "|".join(map(re.escape, alternatives)) + "))"
+        ) if alternatives else None
+
+    def match_tags(self, text: str) -> List[str]:
+        """Rule tags whose keywords occur in `text`, in rule-table order"""
+        if self._pattern is None:
+            return []
+        found = set()
+        for match in self._pattern.finditer(text.lower()):
+            found |= self._tags_for[match.group(1)]
+            if len(found) == len(self.tags):
+                break
+        return [tag for tag in self.tags if tag in found]
+
+    def enrich(
+        self,
+        title: str,
+        description: str = "",
+        default_day: int = 1,
+        extra_tags: Iterable[str] = ()
+    ) -> dict:
+        """Day, tags and excerpt for one video"""
+        day = extract_day(title, default_day)
+        tags = [BASE_TAGS[0], f"Day {day}", *BASE_TAGS[1:], *extra_tags]
+        tags += [tag for tag in self.match_tags(f"{title} {description}") if tag not in tags]
+        return {
+            "day": day,
+            "tags": tags,
+            "excerpt": make_excerpt(description or title)
+        }
+
+    def enrich_many(self, items: Iterable[dict]) -> List[dict]:
+        """enrich() for each {"title", "description"?, "day"?} item, in order"""
+        return [
+            self.enrich(
+                item.get("title", ""),
+                item.get("description") or "",
+                item.get("day") or position
+            )
+            for position, item in enumerate(items, 1)
+        ]
+
+
+def load_tag_rules() -> Dict[str, List[str]]:
+    """Rules from TAG_RULES_FILE (JSON object of tag -> keywords), else the defaults"""
+    rules_file = os.environ.get("TAG_RULES_FILE")
+    if rules_file:
+        return json.loads(Path(rules_file).read_text())
+    return {tag: list(keywords) for tag, keywords in DEFAULT_TAG_RULES.items()}
+
+
+enricher = Enricher(load_tag_rules())
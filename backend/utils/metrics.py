@@ -0,0 +1,274 @@
+"""
+In-process metrics in the Prometheus text format
+
+- MetricsMiddleware: per-route request latency, request/response payload
+  sizes and requests in flight
+- MongoCommandListener: per-collection/command MongoDB timings, registered on
+  the Motor client in database.py
+- monitor_event_loop_lag: how late the event loop wakes a sleeping task,
+  started by the app lifespan
+
+Metrics are process-local; each worker reports its own.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+# How often the event-loop lag probe wakes up
+LOOP_LAG_INTERVAL = 0.5
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        # Mongo listener callbacks arrive on driver threads
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, labels: tuple = (), value: float = 0):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+        # labels -> [per-bucket counts, sum, count]
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = f'le="{_number(bound)}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to send the full response",
+    ("method", "route", "status")
+)
+REQUEST_BYTES = Histogram(
+    "http_request_size_bytes", "Request body size",
+    ("method", "route"), SIZE_BUCKETS
+)
+RESPONSE_BYTES = Histogram(
+    "http_response_size_bytes", "Response body size",
+    ("method", "route"), SIZE_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled")
+MONGO_LATENCY = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command round trip",
+    ("collection", "command", "outcome")
+)
+LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "Delay in waking a task beyond its scheduled time",
+    buckets=LAG_BUCKETS
+)
+LOOP_LAG_LAST = Gauge("event_loop_lag_last_seconds", "Most recent event loop lag sample")
+
+METRICS: List[Metric] = [
+    REQUEST_LATENCY, REQUEST_BYTES, RESPONSE_BYTES, REQUESTS_IN_FLIGHT,
+    MONGO_LATENCY, LOOP_LAG, LOOP_LAG_LAST
+]
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by its route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        request_bytes = 0
+        response_bytes = 0
+
+        async def receive_counted():
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def send_counted(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive_counted, send_counted)
+        finally:
+            REQUESTS_IN_FLIGHT.inc(amount=-1)
+            # The router stores the matched route in the scope; templates keep the label set small
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            REQUEST_LATENCY.observe((method, path, str(status)), time.perf_counter() - started)
+            REQUEST_BYTES.observe((method, path), request_bytes)
+            RESPONSE_BYTES.observe((method, path), response_bytes)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times MongoDB commands per collection and command name"""
+
+    # Handshake, auth and session housekeeping
+    IGNORED_COMMANDS = frozenset({
+        "hello", "ismaster", "isMaster", "saslStart", "saslContinue", "endSessions", "ping"
+    })
+
+    def __init__(self):
+        self._collections: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(event) -> tuple:
+        return (event.connection_id, event.request_id)
+
+    def started(self, event):
+        if event.command_name in self.IGNORED_COMMANDS:
+            return
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        collection = target if isinstance(target, str) else ""
+        with self._lock:
+            self._collections[self._key(event)] = collection
+
+    def _finish(self, event, outcome: str):
+        with self._lock:
+            collection = self._collections.pop(self._key(event), None)
+        if collection is None:
+            return
+        MONGO_LATENCY.observe(
+            (collection, event.command_name, outcome),
+            event.duration_micros / 1_000_000
+        )
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+
+mongo_listener = MongoCommandListener()
+
+
+async def monitor_event_loop_lag(interval: float = LOOP_LAG_INTERVAL):
+    """Sample event loop lag until cancelled"""
+    loop = asyncio.get_running_loop()
+    while True:
+        scheduled = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(loop.time() - scheduled, 0.0)
+        LOOP_LAG.observe((), lag)
+        LOOP_LAG_LAST.set((), lag)
+
+
+def render_cache_stats(caches: Dict[str, dict]) -> List[str]:
+    """Gauges for the numeric fields of each cache's stats()"""
+    values: Dict[str, List[str]] = {}
+    for cache, stats in caches.items():
+        for field, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                name = "cache_" + "".join("_" + c.lower() if c.isupper() else c for c in field)
+                values.setdefault(name, []).append(f'{name}{{cache="{_escape(cache)}"}} {_number(value)}')
+    lines = []
+    for name, samples in values.items():
+        lines += [f"# TYPE {name} gauge", *samples]
+    return lines
+
+
+def render(caches: Dict[str, dict] = None) -> str:
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    if caches:
+        lines += render_cache_stats(caches)
+    return "\n".join(lines) + "\n"
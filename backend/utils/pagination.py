@@ -0,0 +1,47 @@
+import base64
+import json
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+
+def encode_cursor(day: int, object_id) -> str:
+    """Encode the sort key of the last returned video into an opaque token"""
+    payload = json.dumps({"d": day, "i": str(object_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple:
+    """Decode an `after` token back into (day, ObjectId)"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return int(payload["d"]), ObjectId(payload["i"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(day, object_id: ObjectId, field: str = "day") -> dict:
+    """Match everything after (day, _id) in ("day", -1), ("_id", -1) order"""
+    return {
+        "$or": [
+            {field: {"$lt": day}},
+            {field: day, "_id": {"$lt": object_id}}
+        ]
+    }
+
+
+def encode_score_cursor(score: float, object_id) -> str:
+    """Encode the (relevance score, _id) of the last returned search result"""
+    payload = json.dumps({"s": score, "i": str(object_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_score_cursor(token: str) -> tuple:
+    """Decode a search `after` token back into (score, ObjectId)"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(payload["s"]), ObjectId(payload["i"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,230 @@
+"""
+Opt-in sampling profiler for single requests
+
+Installed by server.py only when PROFILING_ENABLED is set, so normal
+deployments run none of this code. With it installed, a request carrying
+`X-Profile: 1` plus an admin JWT (Authorization: Bearer) or a valid /api/db
+key pair (X-API-User / X-API-Key) is run while a background thread samples
+every thread's Python stack. The result is kept in memory under the id
+returned in the `X-Profile-Id` response header, and can be downloaded as
+collapsed stacks (flamegraph.pl, speedscope) or speedscope JSON from
+/api/profiles.
+
+Samples cover the whole process while the request runs, so profile on a
+quiet instance; one request is profiled at a time.
+"""
+
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from utils.auth import decode_token
+
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+
+# Seconds between stack samples; effective resolution is bounded by the GIL switch interval
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", "0.001"))
+
+# Most recent profiles kept for download
+PROFILE_STORE_SIZE = int(os.environ.get("PROFILE_STORE_SIZE", "20"))
+
+PROFILE_HEADER = b"x-profile"
+
+# Stacks of idle worker threads end in one of these and are left out
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+
+Frame = Tuple[str, str, int]
+
+
+def _frame_key(frame) -> Frame:
+    code = frame.f_code
+    return (code.co_name, code.co_filename, code.co_firstlineno)
+
+
+def _stack(frame) -> Tuple[Frame, ...]:
+    """Root-to-leaf frames of one thread"""
+    frames = []
+    while frame is not None:
+        frames.append(_frame_key(frame))
+        frame = frame.f_back
+    return tuple(reversed(frames))
+
+
+class Sampler(threading.Thread):
+    """Samples every other thread's stack until stopped"""
+
+    def __init__(self, loop_thread: int, interval: float = PROFILE_SAMPLE_INTERVAL):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.loop_thread = loop_thread
+        self.interval = interval
+        self.samples: List[Tuple[Tuple[Frame, ...], float]] = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        names: Dict[int, str] = {}
+        last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                stack = _stack(frame)
+                # The event loop thread is always kept: waiting in select() is time spent on I/O
+                if ident != self.loop_thread and stack and stack[-1][1].endswith(_IDLE_FILES):
+                    continue
+                if ident not in names:
+                    names.update((thread.ident, thread.name) for thread in threading.enumerate())
+                thread_frame = ("event loop" if ident == self.loop_thread else names.get(ident, str(ident)), "", 0)
+                self.samples.append(((thread_frame,) + stack, elapsed))
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class Profile:
+    def __init__(self, profile_id: str, name: str, samples: List[Tuple[Tuple[Frame, ...], float]], duration: float):
+        self.id = profile_id
+        self.name = name
+        self.samples = samples
+        self.duration = duration
+        self.created_at = time.time()
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "samples": len(self.samples),
+            "durationMs": round(self.duration * 1000, 2),
+            "createdAt": self.created_at
+        }
+
+    @staticmethod
+    def _label(frame: Frame) -> str:
+        name, filename, line = frame
+        return f"{name} ({os.path.basename(filename)}:{line})" if filename else name
+
+    def collapsed(self) -> str:
+        """One `root;...;leaf <weight>` line per distinct stack, weights in microseconds"""
+        weights: Counter = Counter()
+        for stack, weight in self.samples:
+            weights[";".join(self._label(frame).replace(";", ":") for frame in stack)] += weight
+        return "\n".join(f"{stack} {max(int(weight * 1_000_000), 1)}" for stack, weight in weights.most_common()) + "\n"
+
+    def speedscope(self) -> dict:
+        """Sampled profile in speedscope's file format"""
+        frames: Dict[Frame, int] = {}
+        samples = []
+        for stack, _ in self.samples:
+            samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+        weights = [weight for _, weight in self.samples]
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "average2epic",
+            "activeProfileIndex": 0,
+            "shared": {
+                "frames": [
+                    {"name": name, "file": filename, "line": line} if filename else {"name": name}
+                    for name, filename, line in frames
+                ]
+            },
+            "profiles": [{
+                "type": "sampled",
+                "name": self.name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights
+            }]
+        }
+
+
+class ProfileStore:
+    """The most recent profiles, oldest evicted first"""
+
+    def __init__(self, max_entries: int = PROFILE_STORE_SIZE):
+        self.max_entries = max_entries
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+
+    def add(self, profile: Profile):
+        self._profiles[profile.id] = profile
+        while len(self._profiles) > self.max_entries:
+            self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return self._profiles.get(profile_id)
+
+    def list(self) -> List[dict]:
+        return [profile.summary() for profile in reversed(self._profiles.values())]
+
+
+profile_store = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling authorized requests that ask for it"""
+
+    def __init__(self, app, api_key_store=None):
+        self.app = app
+        self.api_key_store = api_key_store
+        self._busy = threading.Lock()
+
+    def _authorized(self, headers: Dict[bytes, bytes]) -> bool:
+        authorization = headers.get(b"authorization", b"").decode("latin-1")
+        if authorization.lower().startswith("bearer "):
+            try:
+                decode_token(authorization[7:].strip())
+                return True
+            except HTTPException:
+                pass
+        user = headers.get(b"x-api-user")
+        key = headers.get(b"x-api-key")
+        if self.api_key_store is not None and user and key:
+            return self.api_key_store.authenticate(user.decode("latin-1"), key.decode("latin-1")) is not None
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if headers.get(PROFILE_HEADER, b"").lower() not in (b"1", b"true") or not self._authorized(headers):
+            await self.app(scope, receive, send)
+            return
+
+        if not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send_with_headers(send, [(b"x-profile-status", b"busy")]))
+            return
+
+        name = f"{scope['method']} {scope['path']}"
+        if scope.get("query_string"):
+            name += "?" + scope["query_string"].decode("latin-1")
+        profile_id = uuid.uuid4().hex
+        sampler = Sampler(threading.get_ident())
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_headers(send, [(b"x-profile-id", profile_id.encode())]))
+        finally:
+            sampler.stop()
+            profile_store.add(Profile(profile_id, name, sampler.samples, time.perf_counter() - started))
+            self._busy.release()
+
+
+def send_with_headers(send, extra: List[Tuple[bytes, bytes]]):
+    """Wrap an ASGI send to add headers to the response start"""
+    async def wrapped(message):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": list(message.get("headers", [])) + extra}
+        await send(message)
+    return wrapped
@@ -0,0 +1,58 @@
+import json
+import math
+import os
+import time
+from typing import Dict, Tuple
+
+# Requests per second and burst size per permission level
+DEFAULT_RATE_LIMITS = {
+    "read": {"rate": 10, "burst": 20},
+    "write": {"rate": 5, "burst": 10},
+    "delete": {"rate": 1, "burst": 5}
+}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Spend a token; returns 0 on success, else seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """One token bucket per (user, permission level)"""
+
+    def __init__(self, limits: Dict[str, dict]):
+        self.limits = limits
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    def check(self, user: str, level: str) -> int:
+        """Returns 0 when the request may proceed, else a Retry-After in whole seconds"""
+        limit = self.limits.get(level)
+        if limit is None:
+            return 0
+        bucket = self._buckets.get((user, level))
+        if bucket is None:
+            bucket = self._buckets[(user, level)] = TokenBucket(limit["rate"], limit["burst"])
+        wait = bucket.take()
+        return math.ceil(wait) if wait else 0
+
+
+def load_rate_limits() -> Dict[str, dict]:
+    """DEFAULT_RATE_LIMITS, with levels overridden by DB_API_RATE_LIMITS (JSON)"""
+    limits = {level: dict(limit) for level, limit in DEFAULT_RATE_LIMITS.items()}
+    overrides = os.environ.get("DB_API_RATE_LIMITS")
+    if overrides:
+        limits.update(json.loads(overrides))
+    return limits
@@ -0,0 +1,376 @@
+"""
+Related-video neighbor table
+
+Each video's nearest neighbors are precomputed into the `video_related`
+collection ({_id: video _id, related: [card + score], minScore}), so
+/api/videos/{id}/related is a single _id lookup. Similarity mixes TF-IDF
+cosine of title + reflection, Jaccard overlap of topic tags and closeness of
+`day`.
+
+rebuild_related() scores the whole corpus with NumPy. It also stores each
+video's sparse feature row in `video_features` ({_id, vector: {term: weight},
+tags, day, card, minScore}) and the IDF weights it used in `related_meta`.
+
+After a write, refresh_related() builds the changed video's row with those
+stored IDF weights and scores only that row against the stored rows; no
+reflection but its own is read. It rewrites only the lists it affects: its
+own, those it now enters and those that contained it. IDF weights drift as
+videos are added, so rebuild_related() recomputes everything from scratch.
+"""
+
+import asyncio
+import math
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+from pymongo import DeleteOne, ReplaceOne, UpdateOne
+from starlette.concurrency import run_in_threadpool
+
+RELATED_COUNT = int(os.environ.get("RELATED_VIDEOS_COUNT", "6"))
+
+# Relative weight of each signal in the final score
+TEXT_WEIGHT = 0.6
+TAG_WEIGHT = 0.3
+DAY_WEIGHT = 0.1
+
+# Vocabulary cap for the TF-IDF matrix (most frequent terms kept)
+MAX_FEATURES = 5000
+
+# Rows scored per matrix product during a rebuild
+SCORE_CHUNK = 256
+
+# Denormalized into each neighbor entry so the endpoint needs no second query
+CARD_FIELDS = ("title", "youtubeId", "embedUrl", "day", "date", "excerpt", "tags")
+
+CORPUS_PROJECTION = {field: 1 for field in (*CARD_FIELDS, "reflection")}
+
+IDF_ID = "idf"
+
+_WORD = re.compile(r"[a-z0-9']{2,}")
+_DAY_TAG = re.compile(r"^Day \d+$")
+
+STOP_WORDS = frozenset("""
+a an and are as at be but by for from has have i i'm in is it it's my of on or so
+that the this to was we were will with you your me our just not all do
+""".split())
+
+# Refreshes and rebuilds read-modify-write the same lists, so they run one at a time
+_lock = asyncio.Lock()
+
+
+def _tokens(video: dict) -> List[str]:
+    text = f"{video.get('title', '')} {video.get('reflection', '')}".lower()
+    return [word for word in _WORD.findall(text) if word not in STOP_WORDS]
+
+
+def _topic_tags(video: dict) -> set:
+    # "Day N" tags are unique per video and only add noise
+    return {tag for tag in video.get("tags", []) if not _DAY_TAG.match(tag)}
+
+
+def _card(video: dict) -> dict:
+    return {field: video.get(field) for field in CARD_FIELDS}
+
+
+def _entry(video_id: ObjectId, card: dict, score: float) -> dict:
+    entry = {"id": str(video_id), "score": round(score, 4)}
+    entry.update(card)
+    return entry
+
+
+def _related_document(related: List[dict]) -> dict:
+    return {
+        "related": related,
+        # Lists that aren't full take any newcomer
+        "minScore": related[-1]["score"] if len(related) == RELATED_COUNT else 0.0
+    }
+
+
+def text_vector(video: dict, idf: Dict[str, float]) -> Dict[str, float]:
+    """L2-normalized sparse TF-IDF row of a video; terms outside `idf` are dropped"""
+    weights = {
+        term: (1 + math.log(count)) * idf[term]
+        for term, count in Counter(_tokens(video)).items()
+        if term in idf
+    }
+    norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+    return {term: weight / norm for term, weight in weights.items()} if norm else {}
+
+
+def features(video: dict, vector: Dict[str, float]) -> dict:
+    """The stored row a video is scored from"""
+    return {
+        "vector": vector,
+        "tags": sorted(_topic_tags(video)),
+        "day": video.get("day", 0),
+        "card": _card(video)
+    }
+
+
+def similarity(a: dict, b: dict) -> float:
+    """Score of two feature rows; the same formula Corpus.scores applies to matrices"""
+    small, large = sorted((a["vector"], b["vector"]), key=len)
+    text = sum(weight * large.get(term, 0.0) for term, weight in small.items())
+
+    tags_a, tags_b = set(a["tags"]), set(b["tags"])
+    union = len(tags_a | tags_b)
+    tags = len(tags_a & tags_b) / union if union else 0.0
+
+    days = 1 / (1 + abs(a["day"] - b["day"]))
+    return TEXT_WEIGHT * text + TAG_WEIGHT * tags + DAY_WEIGHT * days
+
+
+def top_related(scored: Iterable[Tuple[float, ObjectId, dict]]) -> dict:
+    """Related document from (score, video id, card) candidates"""
+    best = sorted(scored, key=lambda item: -item[0])[:RELATED_COUNT]
+    return _related_document([_entry(video_id, card, score) for score, video_id, card in best])
+
+
+class Corpus:
+    """Feature matrices for every video, scored with NumPy"""
+
+    def __init__(self, videos: List[dict]):
+        self.videos = videos
+        self.position = {video["_id"]: i for i, video in enumerate(videos)}
+        n = len(videos)
+
+        # TF-IDF rows, L2-normalized so a dot product is cosine similarity
+        documents = [Counter(_tokens(video)) for video in videos]
+        df = Counter(term for document in documents for term in document)
+        self.terms = [term for term, _ in df.most_common(MAX_FEATURES)]
+        vocabulary = {term: j for j, term in enumerate(self.terms)}
+        idf = np.array(
+            [math.log((1 + n) / (1 + df[term])) + 1 for term in self.terms],
+            dtype=np.float32
+        )
+        self.idf = {term: float(weight) for term, weight in zip(self.terms, idf)}
+        self.text = np.zeros((n, len(vocabulary)), dtype=np.float32)
+        for i, document in enumerate(documents):
+            for term, count in document.items():
+                j = vocabulary.get(term)
+                if j is not None:
+                    self.text[i, j] = 1 + math.log(count)
+        self.text *= idf
+        norms = np.linalg.norm(self.text, axis=1, keepdims=True)
+        self.text /= np.where(norms == 0, 1, norms)
+
+        # Binary tag membership for Jaccard overlap
+        tag_sets = [_topic_tags(video) for video in videos]
+        tag_index = {tag: j for j, tag in enumerate(sorted(set().union(*tag_sets)))}
+        self.tags = np.zeros((n, len(tag_index)), dtype=np.float32)
+        for i, tags in enumerate(tag_sets):
+            for tag in tags:
+                self.tags[i, tag_index[tag]] = 1
+        self.tag_sizes = self.tags.sum(axis=1)
+
+        self.days = np.array([video.get("day", 0) for video in videos], dtype=np.float32)
+
+    def __len__(self):
+        return len(self.videos)
+
+    def scores(self, rows: np.ndarray) -> np.ndarray:
+        """Similarity of each video in `rows` to every video, shape (len(rows), n)"""
+        text = self.text[rows] @ self.text.T
+
+        overlap = self.tags[rows] @ self.tags.T
+        union = self.tag_sizes[rows, None] + self.tag_sizes[None, :] - overlap
+        tags = np.divide(overlap, union, out=np.zeros_like(overlap), where=union > 0)
+
+        days = 1 / (1 + np.abs(self.days[rows, None] - self.days[None, :]))
+
+        scores = TEXT_WEIGHT * text + TAG_WEIGHT * tags + DAY_WEIGHT * days
+        # A video is never its own neighbor
+        scores[np.arange(len(rows)), rows] = -np.inf
+        return scores
+
+    def neighbors(self, rows: np.ndarray, scores: np.ndarray) -> Dict[ObjectId, dict]:
+        """Related document for each row, from its score vector"""
+        count = min(RELATED_COUNT, len(self) - 1)
+        documents = {}
+        for row, row_scores in zip(rows, scores):
+            if count > 0:
+                top = np.argpartition(-row_scores, count - 1)[:count]
+                top = top[np.argsort(-row_scores[top], kind="stable")]
+            else:
+                top = []
+            related = [self.card(j, float(row_scores[j])) for j in top]
+            documents[self.videos[row]["_id"]] = _related_document(related)
+        return documents
+
+    def card(self, position: int, score: float) -> dict:
+        video = self.videos[position]
+        return _entry(video["_id"], _card(video), score)
+
+    def neighbors_for(self, rows: List[int]) -> Dict[ObjectId, dict]:
+        documents = {}
+        for start in range(0, len(rows), SCORE_CHUNK):
+            chunk = np.array(rows[start:start + SCORE_CHUNK], dtype=np.intp)
+            documents.update(self.neighbors(chunk, self.scores(chunk)))
+        return documents
+
+    def feature_rows(self) -> Dict[ObjectId, dict]:
+        """Sparse feature row of every video, taken from the normalized matrix"""
+        rows = {}
+        for i, video in enumerate(self.videos):
+            nonzero = np.flatnonzero(self.text[i])
+            vector = {self.terms[j]: float(self.text[i, j]) for j in nonzero}
+            rows[video["_id"]] = features(video, vector)
+        return rows
+
+
+async def _write(db, documents: Dict[ObjectId, dict], deleted=(), rows: Dict[ObjectId, dict] = None):
+    """Store related lists (and their minScore on the feature rows), new feature rows and deletions"""
+    now = datetime.utcnow()
+    rows = rows or {}
+    operations = [
+        ReplaceOne({"_id": video_id}, {**document, "updatedAt": now}, upsert=True)
+        for video_id, document in documents.items()
+    ]
+    operations += [DeleteOne({"_id": video_id}) for video_id in deleted]
+    if operations:
+        await db.video_related.bulk_write(operations, ordered=False)
+
+    feature_operations = [
+        ReplaceOne(
+            {"_id": video_id},
+            {**row, "minScore": documents.get(video_id, {}).get("minScore", 0.0)},
+            upsert=True
+        )
+        for video_id, row in rows.items()
+    ]
+    feature_operations += [
+        UpdateOne({"_id": video_id}, {"$set": {"minScore": document["minScore"]}})
+        for video_id, document in documents.items()
+        if video_id not in rows
+    ]
+    feature_operations += [DeleteOne({"_id": video_id}) for video_id in deleted]
+    if feature_operations:
+        await db.video_features.bulk_write(feature_operations, ordered=False)
+
+
+async def _rebuild(db) -> dict:
+    started = time.perf_counter()
+    videos = await db.videos.find({}, CORPUS_PROJECTION).to_list(length=None)
+    corpus = await run_in_threadpool(Corpus, videos)
+    documents = await run_in_threadpool(corpus.neighbors_for, list(range(len(corpus))))
+    rows = await run_in_threadpool(corpus.feature_rows)
+    stale = set(await db.video_related.distinct("_id", {"_id": {"$nin": list(documents)}}))
+    stale |= set(await db.video_features.distinct("_id", {"_id": {"$nin": list(documents)}}))
+    await _write(db, documents, stale, rows)
+    await db.related_meta.replace_one(
+        {"_id": IDF_ID},
+        {"idf": corpus.idf, "videos": len(corpus), "updatedAt": datetime.utcnow()},
+        upsert=True
+    )
+    return {
+        "videos": len(documents),
+        "removed": len(stale),
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+async def rebuild_related(db) -> dict:
+    """Recompute every neighbor list, feature row and the IDF weights"""
+    async with _lock:
+        return await _rebuild(db)
+
+
+def _rescore(row_id: ObjectId, row: dict, rows: Dict[ObjectId, dict]) -> dict:
+    """Full related list of one row against every other row"""
+    return top_related(
+        (similarity(row, other), other_id, other["card"])
+        for other_id, other in rows.items() if other_id != row_id
+    )
+
+
+def score_row(row: dict, rows: Dict[ObjectId, dict]) -> Dict[ObjectId, float]:
+    return {other_id: similarity(row, other) for other_id, other in rows.items()}
+
+
+def plan_refresh(
+    video_id: ObjectId,
+    row: Optional[dict],
+    rows: Dict[ObjectId, dict],
+    scores: Dict[ObjectId, float],
+    lists: Dict[ObjectId, List[dict]]
+) -> Dict[ObjectId, dict]:
+    """New related documents after `video_id` changed to `row` (None when deleted).
+
+    `rows` holds the stored feature rows of every other video, `scores` the
+    changed row's score against each, and `lists` the current lists of the
+    videos that contained it or that it now enters. Every other score in
+    those lists is unchanged, so the video is merged in; a list it was in is
+    only rescored in full when the video may have dropped out of it.
+    """
+    documents = {}
+    if row is not None:
+        documents[video_id] = top_related(
+            (score, other_id, rows[other_id]["card"]) for other_id, score in scores.items()
+        )
+
+    target = str(video_id)
+    for other_id, related in lists.items():
+        other = rows.get(other_id)
+        if other is None:
+            continue
+        contained = any(entry["id"] == target for entry in related)
+        kept = [entry for entry in related if entry["id"] != target]
+        score = scores.get(other_id)
+        # A full list that held the video hides the next-best candidate, so
+        # unless the new score still beats its old last entry it is rescored
+        if score is None or (contained and len(related) == RELATED_COUNT and score < related[-1]["score"]):
+            documents[other_id] = _rescore(other_id, other, rows)
+        else:
+            documents[other_id] = _merge(kept, video_id, row, score)
+    return documents
+
+
+def _merge(related: List[dict], video_id: ObjectId, row: dict, score: float) -> dict:
+    entries = related + [_entry(video_id, row["card"], score)]
+    entries.sort(key=lambda entry: -entry["score"])
+    return _related_document(entries[:RELATED_COUNT])
+
+
+async def refresh_related(db, video_id: str) -> int:
+    """Update the lists affected by a write to one video; returns how many were rewritten"""
+    async with _lock:
+        meta = await db.related_meta.find_one({"_id": IDF_ID})
+        if meta is None:
+            # Nothing has been built yet; the first refresh builds everything
+            return (await _rebuild(db))["videos"]
+
+        object_id = ObjectId(video_id)
+        video = await db.videos.find_one({"_id": object_id}, CORPUS_PROJECTION)
+        row = None if video is None else features(video, text_vector(video, meta["idf"]))
+        rows = {
+            doc["_id"]: doc
+            async for doc in db.video_features.find({"_id": {"$ne": object_id}})
+        }
+        scores = {} if row is None else await run_in_threadpool(score_row, row, rows)
+
+        contained = set(await db.video_related.distinct("_id", {"related.id": video_id}))
+        entering = {other_id for other_id, score in scores.items() if score > rows[other_id].get("minScore", 0.0)}
+        lists = {
+            doc["_id"]: doc["related"]
+            async for doc in db.video_related.find({"_id": {"$in": list(contained | entering)}}, {"related": 1})
+        }
+        documents = await run_in_threadpool(plan_refresh, object_id, row, rows, scores, lists)
+
+        deleted = [object_id] if row is None else []
+        await _write(db, documents, deleted, {} if row is None else {object_id: row})
+        return len(documents) + len(deleted)
+
+
+async def get_related(db, video_id: ObjectId, limit: int) -> Optional[List[dict]]:
+    """Stored neighbors of a video, or None if its list hasn't been built"""
+    document = await db.video_related.find_one(
+        {"_id": video_id},
+        {"related": {"$slice": limit}}
+    )
+    return None if document is None else document["related"]
@@ -0,0 +1,68 @@
+import html
+import re
+from typing import List, Optional, Pattern
+
+# Characters of reflection shown around the first match
+SNIPPET_LENGTH = 160
+
+_TERM = re.compile(r'"([^"]+)"|(-?)(\S+)')
+
+
+def search_terms(query: str) -> List[str]:
+    """Words to highlight for a $text query: phrases and words, minus negated ones"""
+    terms = []
+    for phrase, negated, word in _TERM.findall(query):
+        if phrase:
+            terms.extend(phrase.split())
+        elif not negated:
+            terms.append(word)
+    return [term for term in (t.strip(".,;:!?()[]{}'\"") for t in terms) if term]
+
+
+def highlight_pattern(terms: List[str]) -> Optional[Pattern]:
+    """Whole words starting with any term, as a loose stand-in for Mongo's stemming"""
+    if not terms:
+        return None
+    alternatives = sorted({re.escape(term) for term in terms}, key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(alternatives) + r")\w*", re.IGNORECASE)
+
+
+def highlight(text: str, pattern: Optional[Pattern]) -> str:
+    """HTML-escaped text with matches wrapped in <mark>"""
+    if pattern is None:
+        return html.escape(text)
+    # Matched on the raw text and escaped piece by piece, so a term never
+    # matches inside an entity such as &amp;
+    parts = []
+    position = 0
+    for match in pattern.finditer(text):
+        parts.append(html.escape(text[position:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group(0))}</mark>")
+        position = match.end()
+    parts.append(html.escape(text[position:]))
+    return "".join(parts)
+
+
+def make_snippet(text: str, pattern: Optional[Pattern], length: int = SNIPPET_LENGTH) -> str:
+    """Highlighted window of `text` around its first match, or its start when nothing matches"""
+    match = pattern.search(text) if pattern is not None else None
+    if match is None:
+        window = text[:length]
+        return highlight(window, pattern) + ("..." if len(text) > length else "")
+
+    match_start = match.start()
+    start = max(0, match_start - length // 3)
+    # Don't cut a word in half at either end
+    if start > 0:
+        space = text.find(" ", start)
+        start = space + 1 if 0 <= space < match_start else start
+    end = min(len(text), start + length)
+    if end < len(text):
+        space = text.rfind(" ", start, end)
+        end = space if space > match_start else end
+
+    return (
+        ("..." if start > 0 else "")
+        + highlight(text[start:end], pattern)
+        + ("..." if end < len(text) else "")
+    )
@@ -0,0 +1,54 @@
+from decimal import Decimal
+from typing import Any, Iterable, List
+
+import orjson
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# Non-string dict keys (e.g. $group results keyed by number) are stringified
+# rather than rejected
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def bson_default(value: Any) -> Any:
+    """Encode what orjson doesn't handle natively; datetimes and UUIDs it does itself"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+def dumps(payload: Any) -> bytes:
+    """Serialize a response payload, raw Mongo documents included, to JSON bytes"""
+    return orjson.dumps(payload, default=bson_default, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson; BSON types need no conversion first.
+
+    Return it from a route directly so FastAPI skips jsonable_encoder and
+    response_model validation.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def to_api(doc: dict) -> dict:
+    """Map a stored document to its API shape: `_id` becomes the string `id`"""
+    if "_id" in doc:
+        doc["id"] = str(doc.pop("_id"))
+    return doc
+
+
+def to_api_many(docs: Iterable[dict]) -> List[dict]:
+    return [to_api(doc) for doc in docs]
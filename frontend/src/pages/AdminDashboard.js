@@ -143,19 +143,29 @@ const AdminDashboard = () => {
     }
   };
 
-  const handleEdit = (video) => {
-    setEditingVideo(video);
-    setNewVideo({
-      title: video.title,
-      youtubeId: video.youtubeId,
-      embedUrl: video.embedUrl,
-      day: String(video.day),
-      date: video.date,
-      reflection: video.reflection,
-      tags: video.tags.join(', ')
-    });
-    setShowEditForm(true);
-    setShowAddForm(false);
+  const handleEdit = async (video) => {
+    try {
+      // List entries only carry card fields; load the full reflection for editing
+      const fullVideo = await videoAPI.getById(video.id);
+      setEditingVideo(fullVideo);
+      setNewVideo({
+        title: fullVideo.title,
+        youtubeId: fullVideo.youtubeId,
+        embedUrl: fullVideo.embedUrl,
+        day: String(fullVideo.day),
+        date: fullVideo.date,
+        reflection: fullVideo.reflection,
+        tags: fullVideo.tags.join(', ')
+      });
+      setShowEditForm(true);
+      setShowAddForm(false);
+    } catch (error) {
+      toast({
+        title: "Error",
+        description: "Failed to load video for editing",
+        variant: "destructive",
+      });
+    }
   };
 
   const handleUpdate = async (e) => {
@@ -9,10 +9,12 @@ import DayBadge from '../components/DayBadge';
 const VideoDetail = () => {
   const { id } = useParams();
   const [video, setVideo] = useState(null);
+  const [related, setRelated] = useState([]);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
     loadVideo();
+    loadRelated();
   }, [id]);
 
   const loadVideo = async () => {
@@ -27,6 +29,16 @@ const VideoDetail = () => {
     }
   };
 
+  const loadRelated = async () => {
+    try {
+      const data = await videoAPI.getRelated(id);
+      setRelated(data.videos);
+    } catch (error) {
+      // Related videos are optional; the page works without them
+      setRelated([]);
+    }
+  };
+
   if (loading) {
     return (
       <div className="min-h-screen flex items-center justify-center">
@@ -105,6 +117,22 @@ const VideoDetail = () => {
           </p>
         </div>
 
+        {/* Related Videos */}
+        {related.length > 0 && (
+          <div className="mb-12">
+            <h2 className="text-3xl font-bold mb-6 text-slate-900">Related Days</h2>
+            <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-6">
+              {related.map(item => (
+                <Link key={item.id} to={`/video/${item.id}`} className="block bg-white rounded-2xl shadow-lg p-6 hover:shadow-xl transition-shadow">
+                  <DayBadge day={item.day} />
+                  <h3 className="text-lg font-semibold text-slate-900 mt-3 mb-2">{item.title}</h3>
+                  <p className="text-sm text-slate-600">{item.excerpt}</p>
+                </Link>
+              ))}
+            </div>
+          </div>
+        )}
+
         {/* CTA Section */}
         <div className="bg-gradient-to-r from-purple-600 to-orange-500 text-white rounded-2xl p-8 md:p-12 text-center">
           <h3 className="text-3xl font-bold mb-4">What does epic mean to you?</h3>
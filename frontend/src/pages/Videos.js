@@ -41,17 +41,10 @@ const Videos = () => {
 
   const loadTags = async () => {
     try {
-      const tags = await videoAPI.getTags();
-      setAllTags(tags);
-      
-      // Get video counts per tag
-      const counts = {};
-      for (const tag of tags) {
-        if (tag !== 'All') {
-          const data = await videoAPI.getAll(1, 1, tag);
-          counts[tag] = data.pagination.totalVideos;
-        }
-      }
+      // Tags and their video counts in a single request ("All" comes first)
+      const counts = await videoAPI.getTagCounts();
+      setAllTags(Object.keys(counts));
+      delete counts.All;
       setVideoCounts(counts);
     } catch (error) {
       console.error('Error loading tags:', error);
@@ -25,6 +25,11 @@ export const videoAPI = {
     return response.data;
   },
 
+  getRelated: async (id) => {
+    const response = await axios.get(`${API}/videos/${id}/related`);
+    return response.data;
+  },
+
   create: async (video) => {
     const response = await axios.post(`${API}/videos`, video, {
       headers: getAuthHeader()
@@ -49,6 +54,23 @@ export const videoAPI = {
   getTags: async () => {
     const response = await axios.get(`${API}/videos/tags/all`);
     return response.data;
+  },
+
+  getTagCounts: async () => {
+    const response = await axios.get(`${API}/videos/tags/counts`);
+    return response.data;
+  },
+
+  search: async (q, limit = 12, after = null, tag = null) => {
+    const params = { q, limit };
+    if (after) {
+      params.after = after;
+    }
+    if (tag && tag !== 'All') {
+      params.tag = tag;
+    }
+    const response = await axios.get(`${API}/videos/search`, { params });
+    return response.data;
   }
 };
 
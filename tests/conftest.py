@@ -0,0 +1,38 @@
+"""
+Shared test setup
+
+The backend is imported as a flat set of modules (as uvicorn runs it from
+backend/), so backend/ goes on sys.path. database.db is swapped for
+mongomock_motor before any route module binds it, so nothing here needs a
+running mongod.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = "average2epic_test"
+
+try:
+    from mongomock_motor import AsyncMongoMockClient
+except ImportError:
+    AsyncMongoMockClient = None
+
+if AsyncMongoMockClient is not None:
+    import database
+    database.client = AsyncMongoMockClient()
+    database.db = database.client[os.environ["DB_NAME"]]
+
+
+@pytest.fixture
+def mock_db():
+    if AsyncMongoMockClient is None:
+        pytest.skip("mongomock-motor is not installed")
+    import database
+    return database.db
@@ -0,0 +1,25 @@
+import pytest
+
+pytest.importorskip("httpx")
+from starlette.testclient import TestClient
+
+from utils.api_keys import APIKeyStore
+
+STORE = APIKeyStore({"reader": {"key": "secret", "permissions": ["read"]}})
+
+
+def test_authenticate():
+    assert STORE.authenticate("reader", "secret") == {"user": "reader", "permissions": ["read"]}
+    assert STORE.authenticate("reader", "wrong") is None
+    assert STORE.authenticate("nobody", "secret") is None
+
+
+def test_unknown_user_and_wrong_key_look_the_same(mock_db):
+    import server
+    client = TestClient(server.app)
+    responses = [
+        client.get("/api/db/collections", headers={"X-API-User": user, "X-API-Key": "wrong"})
+        for user in ("average2epic_readonly", "nobody")
+    ]
+    assert [response.status_code for response in responses] == [401, 401]
+    assert responses[0].json() == responses[1].json()
@@ -0,0 +1,114 @@
+import asyncio
+
+from utils.cache import ResponseCache, encode_body, etag_matches
+
+
+def loader(value, calls, delay=0.0):
+    async def load():
+        calls.append(value)
+        await asyncio.sleep(delay)
+        return value
+    return load
+
+
+def test_hit_after_miss():
+    async def scenario():
+        cache = ResponseCache(max_entries=8, ttl=60)
+        calls = []
+        assert await cache.get_or_load(("list", 1), loader("a", calls)) == "a"
+        assert await cache.get_or_load(("list", 1), loader("b", calls)) == "a"
+        return cache, calls
+
+    cache, calls = asyncio.run(scenario())
+    assert calls == ["a"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_concurrent_misses_share_one_load():
+    async def scenario():
+        cache = ResponseCache(max_entries=8, ttl=60)
+        calls = []
+        results = await asyncio.gather(*(
+            cache.get_or_load(("list", 1), loader("a", calls, delay=0.01)) for _ in range(5)
+        ))
+        return cache, calls, results
+
+    cache, calls, results = asyncio.run(scenario())
+    assert results == ["a"] * 5
+    assert calls == ["a"]
+    assert (cache.misses, cache.coalesced) == (1, 4)
+
+
+def test_invalidate_by_route():
+    async def scenario():
+        cache = ResponseCache(max_entries=8, ttl=60)
+        calls = []
+        await cache.get_or_load(("list", 1), loader("list", calls))
+        await cache.get_or_load(("video", "x"), loader("video", calls))
+        cache.invalidate("list")
+        await cache.get_or_load(("list", 1), loader("list", calls))
+        await cache.get_or_load(("video", "x"), loader("video", calls))
+        cache.discard(("video", "x"))
+        await cache.get_or_load(("video", "x"), loader("video", calls))
+        return calls
+
+    assert asyncio.run(scenario()) == ["list", "video", "list", "video"]
+
+
+def test_load_started_before_invalidation_is_not_stored():
+    async def scenario():
+        cache = ResponseCache(max_entries=8, ttl=60)
+        calls = []
+        pending = asyncio.ensure_future(cache.get_or_load(("list", 1), loader("stale", calls, delay=0.01)))
+        await asyncio.sleep(0)
+        cache.invalidate("list")
+        # The caller that started the load still gets its result...
+        assert await pending == "stale"
+        # ...but the next lookup loads again
+        assert await cache.get_or_load(("list", 1), loader("fresh", calls)) == "fresh"
+        assert await cache.get_or_load(("list", 1), loader("other", calls)) == "fresh"
+        return calls
+
+    assert asyncio.run(scenario()) == ["stale", "fresh"]
+
+
+def test_lru_eviction():
+    async def scenario():
+        cache = ResponseCache(max_entries=2, ttl=60)
+        calls = []
+        await cache.get_or_load(("list", 1), loader(1, calls))
+        await cache.get_or_load(("list", 2), loader(2, calls))
+        await cache.get_or_load(("list", 1), loader(1, calls))
+        await cache.get_or_load(("list", 3), loader(3, calls))
+        # 2 was least recently used
+        await cache.get_or_load(("list", 2), loader(2, calls))
+        return calls
+
+    assert asyncio.run(scenario()) == [1, 2, 3, 2]
+
+
+def test_zero_ttl_disables_cache():
+    async def scenario():
+        cache = ResponseCache(max_entries=8, ttl=0)
+        calls = []
+        await asyncio.gather(*(
+            cache.get_or_load(("list", 1), loader("a", calls, delay=0.01)) for _ in range(3)
+        ))
+        return cache, calls
+
+    cache, calls = asyncio.run(scenario())
+    assert calls == ["a"] * 3
+    assert cache.stats()["entries"] == 0
+
+
+def test_etags():
+    cached = encode_body({"videos": ["x" * 2048]})
+    assert cached.etag.startswith('"') and cached.etag.endswith('"')
+    assert cached.etag in cached.etags()
+    assert f'{cached.etag[:-1]}-gzip"' in cached.etags()
+    assert encode_body({"videos": ["x" * 2048]}).etag == cached.etag
+
+    assert etag_matches(cached.etag, cached.etag)
+    assert etag_matches(f'"other", W/{cached.etag}', cached.etag)
+    assert etag_matches("*", cached.etag)
+    assert not etag_matches('"other"', cached.etag)
@@ -0,0 +1,121 @@
+import gzip
+
+import pytest
+
+pytest.importorskip("httpx")
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from utils import compression
+from utils.compression import CompressionMiddleware, encoded_etag, negotiate
+
+BIG = {"reflection": "discipline " * 500}
+
+
+@pytest.fixture(autouse=True)
+def gzip_only(monkeypatch):
+    # Keeps expectations independent of whether Brotli is installed
+    monkeypatch.setattr(compression, "SUPPORTED_ENCODINGS", ("gzip",))
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("gzip", "gzip"),
+    ("deflate, gzip;q=0.5", "gzip"),
+    ("gzip;q=0", None),
+    ("*", "gzip"),
+    ("*;q=0", None),
+    ("identity", None),
+    ("GZIP ; q=1.0", "gzip"),
+    ("gzip;q=oops", None),
+])
+def test_negotiate(header, expected):
+    assert negotiate(header) == expected
+
+
+def test_negotiate_prefers_server_order_on_ties(monkeypatch):
+    monkeypatch.setattr(compression, "SUPPORTED_ENCODINGS", ("br", "gzip"))
+    assert negotiate("gzip, br") == "br"
+    assert negotiate("gzip, br;q=0.5") == "gzip"
+
+
+def test_encoded_etag():
+    assert encoded_etag('"abc"', "gzip") == '"abc-gzip"'
+    assert encoded_etag('W/"abc"', "br") == 'W/"abc-br"'
+
+
+async def big(request):
+    return JSONResponse(BIG, headers={"ETag": '"abc"'})
+
+
+async def small(request):
+    return JSONResponse({"ok": True})
+
+
+async def binary(request):
+    return Response(b"\0" * 4096, media_type="application/octet-stream")
+
+
+async def precompressed(request):
+    return Response(gzip.compress(b"x" * 4096), media_type="text/plain", headers={"Content-Encoding": "gzip"})
+
+
+async def stream(request):
+    async def lines():
+        for i in range(50):
+            yield f'{{"line": {i}, "pad": "{"x" * 40}"}}\n'
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+async def not_modified(request):
+    return PlainTextResponse("", status_code=304)
+
+
+@pytest.fixture
+def client():
+    app = Starlette(routes=[
+        Route("/big", big), Route("/small", small), Route("/binary", binary),
+        Route("/precompressed", precompressed), Route("/stream", stream), Route("/304", not_modified),
+    ])
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return TestClient(app)
+
+
+def test_compresses_large_json(client):
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == '"abc-gzip"'
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert response.json() == BIG
+
+
+def test_identity_when_not_accepted(client):
+    response = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"abc"'
+
+
+@pytest.mark.parametrize("path", ["/small", "/binary", "/precompressed", "/304"])
+def test_leaves_other_responses_alone(client, path):
+    response = client.get(path, headers={"Accept-Encoding": "gzip"})
+    if path == "/precompressed":
+        assert response.content == b"x" * 4096
+    else:
+        assert "content-encoding" not in response.headers
+
+
+def test_small_response_still_varies(client):
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_streams_compressed(client):
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    lines = response.text.splitlines()
+    assert len(lines) == 50 and lines[-1].startswith('{"line": 49')
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from utils.counts import ALL, CountCache
+
+
+@pytest.fixture
+def videos(mock_db):
+    collection = mock_db.counts_test
+    asyncio.run(collection.delete_many({}))
+    asyncio.run(collection.insert_many([
+        {"tags": ["Fitness", "Mindset"]},
+        {"tags": ["Fitness"]},
+        {"tags": ["Mindset", "Mindset"]},
+        {"tags": []},
+    ]))
+    return collection
+
+
+def test_get_counts_and_caches(videos):
+    cache = CountCache(videos, "tags", ttl=60)
+    assert asyncio.run(cache.get()) == 4
+    assert asyncio.run(cache.get("Fitness")) == 2
+    assert asyncio.run(cache.get("Fitness")) == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_writes_adjust_cached_counts(videos):
+    cache = CountCache(videos, "tags", ttl=60)
+    asyncio.run(cache.get())
+    asyncio.run(cache.get("Fitness"))
+
+    cache.record_insert(["Fitness", "Fitness", ALL])
+    assert asyncio.run(cache.get()) == 5
+    assert asyncio.run(cache.get("Fitness")) == 3
+
+    cache.record_update(["Fitness"], ["Mindset"])
+    assert asyncio.run(cache.get("Fitness")) == 2
+
+    cache.record_delete(["Fitness"])
+    assert asyncio.run(cache.get()) == 4
+    assert asyncio.run(cache.get("Fitness")) == 1
+    # Only cached keys are adjusted; nothing was loaded from the collection again
+    assert cache.misses == 2
+
+
+def test_all_counts_then_new_tag(videos):
+    cache = CountCache(videos, "tags", ttl=60)
+    assert asyncio.run(cache.all_counts()) == {ALL: 4, "Fitness": 2, "Mindset": 2}
+    # The full tag set is cached, so unknown tags count as zero without a query
+    assert asyncio.run(cache.get("Progress")) == 0
+
+    cache.record_insert(["Progress"])
+    assert asyncio.run(cache.all_counts()) == {ALL: 5, "Fitness": 2, "Mindset": 2, "Progress": 1}
+
+    cache.record_delete(["Mindset"])
+    cache.record_delete(["Mindset"])
+    assert asyncio.run(cache.all_counts()) == {ALL: 3, "Fitness": 2, "Progress": 1}
+    assert cache.misses == 0
+
+
+def test_invalidate_recounts(videos):
+    cache = CountCache(videos, "tags", ttl=60)
+    asyncio.run(cache.get())
+    asyncio.run(videos.insert_one({"tags": []}))
+    assert asyncio.run(cache.get()) == 4
+    cache.invalidate()
+    assert asyncio.run(cache.get()) == 5
+
+
+def test_zero_ttl_always_counts(videos):
+    cache = CountCache(videos, "tags", ttl=0)
+    asyncio.run(cache.all_counts())
+    asyncio.run(cache.get())
+    asyncio.run(cache.get())
+    assert cache.hits == 0
+
+
+def test_count_racing_a_write_is_not_stored(videos):
+    cache = CountCache(videos, "tags", ttl=60)
+    count_documents = videos.count_documents
+
+    async def racing_count(query):
+        result = await count_documents(query)
+        cache.record_insert([])
+        return result
+
+    videos.count_documents = racing_count
+    assert asyncio.run(cache.get()) == 4
+    videos.count_documents = count_documents
+    assert asyncio.run(cache.get()) == 4
+    assert cache.misses == 2
@@ -0,0 +1,204 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+pytest.importorskip("httpx")
+from fastapi import HTTPException
+from starlette.testclient import TestClient
+
+from routes.db_api import (
+    MAX_QUERY_LIMIT, MAX_QUERY_SKIP, MAX_TIME_MS, STREAM_MAX_TIME_MS, BulkOperation, BulkRequest, QueryRequest,
+    _plan_stages, bulk_response, enforce_query_limits, max_time_for, summarize_explain,
+)
+
+ADMIN = {"X-API-User": "average2epic_admin", "X-API-Key": "Average2Epic_API_Key_2025!"}
+
+
+def bulk_request(ops, ordered=True):
+    return BulkRequest(collection="items", ordered=ordered, operations=[BulkOperation(**op) for op in ops])
+
+
+OPS = [
+    {"op": "insert", "document": {"a": 1}},
+    {"op": "upsert", "filter": {"a": 2}, "update": {"$set": {"b": 1}}},
+    {"op": "insert", "document": {"a": 3}},
+    {"op": "delete", "filter": {"a": 1}},
+]
+
+
+def test_ordered_batch_stops_at_first_error():
+    inserted = {0: ObjectId(), 2: ObjectId()}
+    upserted_id = ObjectId()
+    details = {
+        "nInserted": 1, "nUpserted": 1, "nMatched": 0, "nModified": 0, "nRemoved": 0,
+        "upserted": [{"index": 1, "_id": upserted_id}],
+        "writeErrors": [{"index": 2, "code": 11000, "errmsg": "E11000 duplicate key"}],
+        "writeConcernErrors": [],
+    }
+    response = bulk_response(bulk_request(OPS), details, inserted, 1.234)
+
+    assert response["success"] is False
+    assert response["acknowledged"] is True
+    assert response["elapsed_ms"] == 1.23
+    assert (response["inserted_count"], response["upserted_count"], response["error_count"]) == (1, 1, 1)
+    assert response["results"] == [
+        {"index": 0, "op": "insert", "status": "ok", "inserted_id": str(inserted[0])},
+        {"index": 1, "op": "upsert", "status": "ok", "upserted_id": str(upserted_id)},
+        {"index": 2, "op": "insert", "status": "error", "error": "E11000 duplicate key", "code": 11000},
+        {"index": 3, "op": "delete", "status": "not_executed"},
+    ]
+
+
+def test_unordered_batch_runs_past_errors():
+    details = {"nInserted": 1, "nRemoved": 1, "writeErrors": [{"index": 0, "code": 11000, "errmsg": "dup"}]}
+    response = bulk_response(bulk_request(OPS, ordered=False), details, {0: ObjectId(), 2: ObjectId()}, 0)
+    assert [entry["status"] for entry in response["results"]] == ["error", "ok", "ok", "ok"]
+    assert "upserted_id" not in response["results"][1]
+
+
+def test_write_concern_errors_fail_the_batch():
+    details = {"nInserted": 1, "writeConcernErrors": [{"errmsg": "waiting for replication timed out"}]}
+    response = bulk_response(bulk_request(OPS[:1]), details, {0: ObjectId()}, 0)
+    assert response["success"] is False
+    assert response["write_concern_errors"] == ["waiting for replication timed out"]
+
+
+def test_unacknowledged_batch():
+    response = bulk_response(bulk_request(OPS), None, {}, 2.0)
+    assert response == {"success": True, "collection": "items", "acknowledged": False, "elapsed_ms": 2.0}
+
+
+@pytest.fixture
+def client(mock_db):
+    import server
+    asyncio.run(mock_db.items.drop())
+    return TestClient(server.app)
+
+
+def test_bulk_route_stops_ordered_batch_at_duplicate(client, mock_db):
+    asyncio.run(mock_db.items.create_index("a", unique=True))
+    asyncio.run(mock_db.items.insert_one({"a": 3}))
+    response = client.post("/api/db/bulk", headers=ADMIN, json={"collection": "items", "operations": OPS})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["success"] is False
+    assert [entry["status"] for entry in body["results"]] == ["ok", "ok", "error", "not_executed"]
+    # The delete after the failed insert never ran
+    assert asyncio.run(mock_db.items.count_documents({"a": 1})) == 1
+
+
+def test_bulk_route_requires_update_for_upserts(client):
+    response = client.post("/api/db/bulk", headers=ADMIN, json={
+        "collection": "items", "operations": [{"op": "upsert", "filter": {"a": 1}}]
+    })
+    assert response.status_code == 400
+
+
+# Query limits and explain summaries
+
+
+def test_max_time_is_clamped_to_the_ceiling():
+    assert max_time_for(None) == MAX_TIME_MS
+    assert max_time_for(0) == MAX_TIME_MS
+    assert max_time_for(-5) == MAX_TIME_MS
+    assert max_time_for(100) == 100
+    assert max_time_for(MAX_TIME_MS * 10) == MAX_TIME_MS
+    assert max_time_for(None, stream=True) == STREAM_MAX_TIME_MS
+    assert max_time_for(STREAM_MAX_TIME_MS + 1, stream=True) == STREAM_MAX_TIME_MS
+
+
+@pytest.mark.parametrize("fields", [
+    {"limit": 0},
+    {"limit": MAX_QUERY_LIMIT + 1},
+    {"skip": -1},
+    {"skip": MAX_QUERY_SKIP + 1},
+    {"limit": -1, "stream": True},
+    {"skip": MAX_QUERY_SKIP + 1, "stream": True},
+])
+def test_query_limits_reject_out_of_bounds(fields):
+    with pytest.raises(HTTPException) as raised:
+        enforce_query_limits(QueryRequest(collection="items", **fields))
+    assert raised.value.status_code == 400
+
+
+@pytest.mark.parametrize("fields", [
+    {"limit": 1},
+    {"limit": MAX_QUERY_LIMIT, "skip": MAX_QUERY_SKIP},
+    {"limit": 0, "stream": True},
+    {"limit": MAX_QUERY_LIMIT * 100, "stream": True},
+])
+def test_query_limits_accept_in_bounds(fields):
+    enforce_query_limits(QueryRequest(collection="items", **fields))
+
+
+COLLSCAN_EXPLAIN = {
+    "queryPlanner": {
+        "winningPlan": {
+            "stage": "LIMIT",
+            "limitAmount": 10,
+            "inputStage": {
+                "stage": "SORT",
+                "inputStage": {"stage": "COLLSCAN", "filter": {"tags": {"$eq": "ai"}}, "direction": "forward"},
+            },
+        },
+        "rejectedPlans": [],
+    },
+    "executionStats": {
+        "nReturned": 10, "executionTimeMillis": 42, "totalKeysExamined": 0, "totalDocsExamined": 5000,
+    },
+}
+
+IXSCAN_EXPLAIN = {
+    "queryPlanner": {
+        "winningPlan": {
+            "stage": "FETCH",
+            "inputStage": {"stage": "IXSCAN", "indexName": "publishedAt_-1", "keyPattern": {"publishedAt": -1}},
+        },
+    },
+}
+
+# The slot-based engine nests its classic-looking plan under queryPlan
+SBE_EXPLAIN = {
+    "queryPlanner": {
+        "winningPlan": {
+            "queryPlan": {
+                "stage": "OR",
+                "inputStages": [
+                    {"stage": "IXSCAN", "indexName": "title_1"},
+                    {"stage": "IXSCAN", "indexName": "tags_1"},
+                ],
+            },
+            "slotBasedPlan": {"slots": "..."},
+        },
+    },
+}
+
+
+def test_plan_stages_walks_nested_and_listed_inputs():
+    assert [stage["stage"] for stage in _plan_stages(COLLSCAN_EXPLAIN["queryPlanner"]["winningPlan"])] == [
+        "LIMIT", "SORT", "COLLSCAN"
+    ]
+    assert [stage["stage"] for stage in _plan_stages(SBE_EXPLAIN)] == ["OR", "IXSCAN", "IXSCAN"]
+
+
+def test_summarize_explain_flags_collection_scans():
+    summary = summarize_explain(COLLSCAN_EXPLAIN)
+    assert summary["collection_scan"] is True
+    assert summary["stages"] == ["LIMIT", "SORT", "COLLSCAN"]
+    assert summary["indexes_used"] == []
+    assert (summary["docs_examined"], summary["keys_examined"]) == (5000, 0)
+    assert (summary["n_returned"], summary["execution_time_ms"]) == (10, 42)
+
+
+def test_summarize_explain_lists_indexes():
+    summary = summarize_explain(IXSCAN_EXPLAIN)
+    assert summary["collection_scan"] is False
+    assert summary["indexes_used"] == ["publishedAt_-1"]
+    assert summary["docs_examined"] is None
+    assert summarize_explain(SBE_EXPLAIN)["indexes_used"] == ["tags_1", "title_1"]
+
+
+def test_query_route_rejects_oversized_limit(client):
+    response = client.post("/api/db/query", headers=ADMIN, json={"collection": "items", "limit": MAX_QUERY_LIMIT + 1})
+    assert response.status_code == 400
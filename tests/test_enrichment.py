@@ -0,0 +1,54 @@
+import random
+
+from utils.enrichment import DEFAULT_TAG_RULES, Enricher, extract_day, make_excerpt
+
+
+def substring_tags(text):
+    """The per-keyword substring test the importers used before Enricher"""
+    combined_text = text.lower()
+    return [
+        tag for tag, keywords in DEFAULT_TAG_RULES.items()
+        if any(word in combined_text for word in keywords)
+    ]
+
+
+WORDS = [
+    "fitness", "workout", "gym", "training", "exercise", "morning", "routine", "am",
+    "grind", "discipline", "consistency", "hustle", "mindset", "mental", "focus",
+    "motivation", "progress", "update", "check", "Gymnastics", "CHECKPOINT", "game",
+    "camera", "day", "sleep", "code", "read", "  ", "-", "", "ma", "gy", "upd",
+]
+
+
+def test_matches_substring_rules_on_random_text():
+    rng = random.Random(7)
+    enricher = Enricher(DEFAULT_TAG_RULES)
+    for _ in range(2000):
+        # Empty separators glue words together so keywords straddle word boundaries
+        text = "".join(rng.choice(WORDS) + rng.choice(["", " ", "\n"]) for _ in range(rng.randint(0, 12)))
+        assert enricher.match_tags(text) == substring_tags(text), text
+
+
+def test_overlapping_and_prefix_keywords():
+    enricher = Enricher({"Short": ["up"], "Long": ["update"], "Inner": ["date"]})
+    assert enricher.match_tags("UPDATE") == ["Short", "Long", "Inner"]
+    assert enricher.match_tags("upstate") == ["Short"]
+    assert Enricher({}).match_tags("anything") == []
+
+
+def test_enrich():
+    enricher = Enricher(DEFAULT_TAG_RULES)
+    result = enricher.enrich("Day 12 - Gym session", "Morning workout " * 10, default_day=3)
+    assert result["day"] == 12
+    assert result["tags"] == ["Average2Epic", "Day 12", "Transformation", "Fitness", "Morning Routine"]
+    assert result["excerpt"] == make_excerpt("Morning workout " * 10)
+
+    assert enricher.enrich("Untitled", default_day=3)["day"] == 3
+    assert enricher.enrich("Gym day", extra_tags=["Fitness"])["tags"].count("Fitness") == 1
+
+
+def test_extract_day_and_excerpt():
+    assert extract_day("day7 recap", 1) == 7
+    assert extract_day("No number", 5) == 5
+    assert make_excerpt("short") == "short"
+    assert make_excerpt("x" * 100) == "x" * 80 + "..."
@@ -0,0 +1,87 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+import import_from_json
+from import_from_json import import_records, insert_batch, iter_json_array, iter_records
+
+RECORDS = [
+    {"day": 1, "title": "Day 1 - Start, [again]", "videoId": "a1"},
+    {"day": 22, "title": "Quote \" and \\ escapes ]", "videoId": "b2", "score": 12345.678},
+    {"day": 333, "title": "Unicode ✓ café", "videoId": "c3", "nested": {"list": [1, 2, [3]]}},
+    1234567890,
+    -0.5e10,
+    "plain string",
+    None,
+    [],
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 64, 1 << 16])
+def test_iter_json_array_across_chunk_boundaries(monkeypatch, chunk_size):
+    monkeypatch.setattr(import_from_json, "READ_CHUNK_SIZE", chunk_size)
+    text = json.dumps(RECORDS, indent=2, ensure_ascii=False)
+    assert list(iter_json_array(io.StringIO(text))) == RECORDS
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 1 << 16])
+def test_iter_json_array_trailing_number(monkeypatch, chunk_size):
+    # The last number is only complete once the reader hits ']'
+    monkeypatch.setattr(import_from_json, "READ_CHUNK_SIZE", chunk_size)
+    assert list(iter_json_array(io.StringIO("[1, 22, 333]"))) == [1, 22, 333]
+    assert list(iter_json_array(io.StringIO("[]"))) == []
+
+
+def test_iter_json_array_rejects_non_arrays():
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('{"day": 1}')))
+
+
+def test_iter_json_array_rejects_truncated_input(monkeypatch):
+    monkeypatch.setattr(import_from_json, "READ_CHUNK_SIZE", 4)
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(io.StringIO('[{"day": 1}, {"day": ')))
+
+
+def test_iter_records_reads_arrays_and_ndjson(tmp_path):
+    array_file = tmp_path / "videos.json"
+    array_file.write_text("  \n" + json.dumps(RECORDS[:3]))
+    assert list(iter_records(array_file)) == RECORDS[:3]
+
+    ndjson_file = tmp_path / "videos.ndjson"
+    ndjson_file.write_text("\n".join(json.dumps(record) for record in RECORDS[:3]) + "\n\nnot json\n")
+    assert list(iter_records(ndjson_file)) == RECORDS[:3]
+
+
+@pytest.fixture
+def collection():
+    mongomock = pytest.importorskip("mongomock")
+    return mongomock.MongoClient().db.videos
+
+
+def test_insert_batch_skips_existing(collection):
+    collection.insert_one({"youtubeId": "a1", "title": "Existing"})
+    docs = [{"youtubeId": video_id, "title": video_id} for video_id in ("a1", "b2", "c3")]
+
+    assert asyncio.run(insert_batch(collection, docs)) == (2, 1)
+    assert sorted(collection.distinct("youtubeId")) == ["a1", "b2", "c3"]
+    assert collection.find_one({"youtubeId": "a1"})["title"] == "Existing"
+
+    assert asyncio.run(insert_batch(collection, docs)) == (0, 3)
+    assert collection.count_documents({}) == 3
+
+
+def test_import_records_dedupes_within_and_across_batches(collection):
+    collection.insert_one({"youtubeId": "v0", "title": "Existing"})
+    records = [{"day": i, "title": f"Day {i}", "videoId": f"v{i % 5}"} for i in range(12)]
+    records.append({"day": 99, "title": "", "videoId": "v99"})
+
+    counts = asyncio.run(import_records(collection, records, batch_size=3))
+
+    assert counts["read"] == 13
+    assert counts["imported"] == 4
+    assert counts["skipped"] == 8
+    assert counts["invalid"] == 1
+    assert sorted(collection.distinct("youtubeId")) == [f"v{i}" for i in range(5)]
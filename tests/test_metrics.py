@@ -0,0 +1,106 @@
+import math
+
+import pytest
+from bson import ObjectId
+
+pytest.importorskip("httpx")
+from starlette.testclient import TestClient
+
+from utils import metrics
+from utils.metrics import Counter, Gauge, Histogram, render, render_cache_stats
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(("/a",), value)
+    assert histogram.render() == [
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'latency_seconds_bucket{route="/a",le="1"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'latency_seconds_sum{route="/a"} 3.65',
+        'latency_seconds_count{route="/a"} 4',
+    ]
+
+
+def test_histogram_keeps_one_series_per_label_set():
+    histogram = Histogram("size_bytes", "Size", ("method",), buckets=(100,))
+    histogram.observe(("POST",), 500)
+    histogram.observe(("GET",), 10)
+    lines = histogram.render()[2:]
+    assert lines == [
+        'size_bytes_bucket{method="GET",le="100"} 1',
+        'size_bytes_bucket{method="GET",le="+Inf"} 1',
+        'size_bytes_sum{method="GET"} 10.0',
+        'size_bytes_count{method="GET"} 1',
+        'size_bytes_bucket{method="POST",le="100"} 0',
+        'size_bytes_bucket{method="POST",le="+Inf"} 1',
+        'size_bytes_sum{method="POST"} 500.0',
+        'size_bytes_count{method="POST"} 1',
+    ]
+    assert histogram.buckets[-1] == math.inf
+
+
+def test_counters_gauges_and_label_escaping():
+    counter = Counter("hits_total", "Hits", ("path",))
+    counter.inc(('say "hi"\\n',))
+    counter.inc(('say "hi"\\n',), 2)
+    assert counter.render()[2:] == ['hits_total{path="say \\"hi\\"\\\\n"} 3']
+
+    gauge = Gauge("in_flight", "In flight")
+    gauge.inc()
+    gauge.inc()
+    gauge.inc(amount=-1)
+    assert gauge.render()[2:] == ["in_flight 1"]
+    gauge.set((), 0.25)
+    assert gauge.render()[2:] == ["in_flight 0.25"]
+
+
+def test_cache_stats_become_gauges():
+    lines = render_cache_stats({"videos": {"hits": 3, "hitRate": 0.75, "enabled": True, "name": "x"}})
+    assert lines == [
+        "# TYPE cache_hits gauge",
+        'cache_hits{cache="videos"} 3',
+        "# TYPE cache_hit_rate gauge",
+        'cache_hit_rate{cache="videos"} 0.75',
+    ]
+
+
+def test_render_includes_every_metric_and_caches():
+    body = render({"videos": {"size": 1}})
+    assert body.endswith("\n")
+    for metric in metrics.METRICS:
+        assert f"# TYPE {metric.name} {metric.kind}" in body
+    assert 'cache_size{cache="videos"} 1' in body
+
+
+@pytest.fixture
+def fresh_metrics(monkeypatch):
+    latency = Histogram("http_request_duration_seconds", "Latency", ("method", "route", "status"))
+    monkeypatch.setattr(metrics, "REQUEST_LATENCY", latency)
+    return latency
+
+
+def test_middleware_labels_requests_by_route_template(fresh_metrics, mock_db):
+    import server
+    client = TestClient(server.app)
+    for _ in range(2):
+        client.get(f"/api/videos/{ObjectId()}")
+    client.get("/no/such/path")
+
+    series = {labels: count for labels, (_, _, count) in fresh_metrics._series.items()}
+    assert series[("GET", "/api/videos/{video_id}", "404")] == 2
+    assert series[("GET", "unmatched", "404")] == 1
+    # Concrete ids never become label values
+    assert {route for _, route, _ in series} == {"/api/videos/{video_id}", "unmatched"}
+
+
+def test_metrics_endpoint_serves_prometheus_text(mock_db):
+    import server
+    response = TestClient(server.app).get("/api/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert 'cache="video_responses"' in response.text
@@ -0,0 +1,53 @@
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from utils.pagination import (
+    decode_cursor, decode_score_cursor, encode_cursor, encode_score_cursor, keyset_filter
+)
+
+
+def test_cursor_round_trip():
+    object_id = ObjectId()
+    token = encode_cursor(42, object_id)
+    assert "=" not in token
+    assert decode_cursor(token) == (42, object_id)
+
+
+def test_score_cursor_round_trip():
+    object_id = ObjectId()
+    assert decode_score_cursor(encode_score_cursor(1.25, object_id)) == (1.25, object_id)
+
+
+@pytest.mark.parametrize("token", ["", "not-base64!", "e30", encode_cursor(1, ObjectId())[:-3], "eyJkIjoxLCJpIjoieCJ9"])
+def test_decode_cursor_rejects_bad_tokens(token):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(token)
+    assert error.value.status_code == 400
+
+
+def test_keyset_filter_shape():
+    object_id = ObjectId()
+    assert keyset_filter(5, object_id) == {
+        "$or": [{"day": {"$lt": 5}}, {"day": 5, "_id": {"$lt": object_id}}]
+    }
+
+
+def test_keyset_pages_cover_sort_order_exactly():
+    mongomock = pytest.importorskip("mongomock")
+    collection = mongomock.MongoClient().db.videos
+    # Repeated days make _id the tie-breaker
+    collection.insert_many([{"day": day % 7} for day in range(30)])
+    sort = [("day", -1), ("_id", -1)]
+    expected = [doc["_id"] for doc in collection.find({}).sort(sort)]
+
+    seen, query = [], {}
+    while True:
+        page = list(collection.find(query).sort(sort).limit(4))
+        if not page:
+            break
+        seen += [doc["_id"] for doc in page]
+        day, object_id = decode_cursor(encode_cursor(page[-1]["day"], page[-1]["_id"]))
+        query = keyset_filter(day, object_id)
+
+    assert seen == expected
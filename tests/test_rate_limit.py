@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("httpx")
+from starlette.testclient import TestClient
+
+from routes import db_api
+from utils import rate_limit
+from utils.rate_limit import DEFAULT_RATE_LIMITS, RateLimiter, TokenBucket, load_rate_limits
+
+READONLY = {"X-API-User": "average2epic_readonly", "X-API-Key": "Average2Epic_ReadOnly_2025!"}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def test_bucket_spends_its_burst_then_waits(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take() == pytest.approx(0.5)
+
+
+def test_bucket_refills_at_its_rate(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    for _ in range(3):
+        bucket.take()
+    clock.now += 0.25
+    # Half a token back: the next one is another quarter second away
+    assert bucket.take() == pytest.approx(0.25)
+    clock.now += 0.25
+    assert bucket.take() == 0.0
+    assert bucket.take() > 0
+
+
+def test_bucket_refill_is_capped_at_burst(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    bucket.take()
+    clock.now += 3600
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take() > 0
+
+
+def test_limiter_rounds_retry_after_up_and_keeps_buckets_apart(clock):
+    limiter = RateLimiter({"write": {"rate": 0.4, "burst": 1}})
+    assert limiter.check("alice", "write") == 0
+    # A token takes 2.5 s to come back
+    assert limiter.check("alice", "write") == 3
+    assert limiter.check("bob", "write") == 0
+    clock.now += 2.5
+    assert limiter.check("alice", "write") == 0
+
+
+def test_limiter_ignores_unlimited_levels(clock):
+    limiter = RateLimiter({"write": {"rate": 1, "burst": 1}})
+    assert all(limiter.check("alice", "read") == 0 for _ in range(100))
+
+
+def test_rate_limits_from_environment(monkeypatch):
+    monkeypatch.setenv("DB_API_RATE_LIMITS", '{"read": {"rate": 100, "burst": 200}}')
+    limits = load_rate_limits()
+    assert limits["read"] == {"rate": 100, "burst": 200}
+    assert limits["write"] == DEFAULT_RATE_LIMITS["write"]
+
+
+def test_exhausted_limit_returns_429_with_retry_after(clock, monkeypatch, mock_db):
+    import server
+    monkeypatch.setattr(db_api, "rate_limiter", RateLimiter({"read": {"rate": 0.5, "burst": 1}}))
+    client = TestClient(server.app)
+
+    def count():
+        return client.post("/api/db/count", headers=READONLY, json={"collection": "items"})
+
+    assert count().status_code == 200
+    response = count()
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+
+    clock.now += 2
+    assert count().status_code == 200
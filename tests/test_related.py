@@ -0,0 +1,182 @@
+import asyncio
+import random
+
+import numpy as np
+import pytest
+from bson import ObjectId
+
+from utils import related
+from utils.related import (
+    RELATED_COUNT, Corpus, rebuild_related, refresh_related, similarity, top_related,
+)
+
+WORDS = "gym run focus sleep code morning grind read journal cold walk plan ship".split()
+TAGS = ["Fitness", "Mindset", "Discipline", "Progress"]
+
+
+def make_video(rng, day):
+    return {
+        "_id": ObjectId(),
+        "title": f"Day {day} " + " ".join(rng.choice(WORDS) for _ in range(3)),
+        "reflection": " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 30))),
+        "tags": ["Average2Epic", f"Day {day}"] + rng.sample(TAGS, rng.randint(0, 2)),
+        "day": day,
+    }
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@pytest.fixture
+def db(mock_db):
+    for name in ("videos", "video_related", "video_features", "related_meta"):
+        run(mock_db[name].delete_many({}))
+    return mock_db
+
+
+async def stored(db):
+    rows = {doc["_id"]: doc async for doc in db.video_features.find({})}
+    lists = {doc["_id"]: doc async for doc in db.video_related.find({})}
+    return rows, lists
+
+
+def assert_consistent(rows, lists):
+    """Every stored list is the top RELATED_COUNT of the stored rows, minScore included"""
+    assert set(lists) == set(rows)
+    for video_id, row in rows.items():
+        expected = top_related(
+            (similarity(row, other), other_id, other["card"])
+            for other_id, other in rows.items() if other_id != video_id
+        )
+        document = lists[video_id]
+        assert [entry["id"] for entry in document["related"]] == [entry["id"] for entry in expected["related"]]
+        assert [entry["score"] for entry in document["related"]] == pytest.approx(
+            [entry["score"] for entry in expected["related"]], abs=2e-4
+        )
+        assert document["minScore"] == pytest.approx(expected["minScore"], abs=2e-4)
+        assert row["minScore"] == document["minScore"]
+
+
+def test_incremental_refresh_matches_full_rescore(db):
+    rng = random.Random(3)
+    videos = [make_video(rng, day) for day in range(1, 40)]
+    run(db.videos.insert_many(videos))
+    run(rebuild_related(db))
+    assert_consistent(*run(stored(db)))
+
+    for step in range(30):
+        action = rng.choice(["insert", "update", "delete"])
+        if action == "insert":
+            video = make_video(rng, rng.randint(1, 60))
+            run(db.videos.insert_one(video))
+            video_id = video["_id"]
+        else:
+            video_id = rng.choice([doc["_id"] for doc in run(db.videos.find({}, {"_id": 1}).to_list(None))])
+            if action == "update":
+                changed = make_video(rng, rng.randint(1, 60))
+                changed.pop("_id")
+                run(db.videos.update_one({"_id": video_id}, {"$set": changed}))
+            else:
+                run(db.videos.delete_one({"_id": video_id}))
+        run(refresh_related(db, str(video_id)))
+        assert_consistent(*run(stored(db)))
+
+
+def test_refresh_reads_only_the_changed_reflection(db, monkeypatch):
+    rng = random.Random(5)
+    videos = [make_video(rng, day) for day in range(1, 20)]
+    run(db.videos.insert_many(videos))
+    run(rebuild_related(db))
+
+    def no_corpus(*args):
+        raise AssertionError("refresh must not rebuild the corpus")
+    monkeypatch.setattr(related, "Corpus", no_corpus)
+    run(db.videos.update_one({"_id": videos[0]["_id"]}, {"$set": {"reflection": "cold walk cold walk"}}))
+    assert run(refresh_related(db, str(videos[0]["_id"]))) >= 1
+
+
+def test_first_refresh_builds_everything(db):
+    rng = random.Random(9)
+    videos = [make_video(rng, day) for day in range(1, RELATED_COUNT + 4)]
+    run(db.videos.insert_many(videos))
+    assert run(refresh_related(db, str(videos[0]["_id"]))) == len(videos)
+    assert run(db.related_meta.find_one({"_id": "idf"}))["videos"] == len(videos)
+
+
+def test_scores_exclude_self_and_match_the_sparse_formula():
+    rng = random.Random(1)
+    corpus = Corpus([make_video(rng, day) for day in range(1, 15)])
+    rows = np.arange(len(corpus))
+    scores = corpus.scores(rows)
+    assert np.all(np.isneginf(np.diag(scores)))
+
+    features = corpus.feature_rows()
+    ids = [video["_id"] for video in corpus.videos]
+    for i in (0, 5, 13):
+        for j in (1, 7, 12):
+            if i != j:
+                assert scores[i, j] == pytest.approx(similarity(features[ids[i]], features[ids[j]]), abs=1e-5)
+
+
+def test_neighbors_are_ordered_and_never_self():
+    rng = random.Random(2)
+    corpus = Corpus([make_video(rng, day) for day in range(1, 25)])
+    documents = corpus.neighbors_for(list(range(len(corpus))))
+    for video_id, document in documents.items():
+        related_ids = [entry["id"] for entry in document["related"]]
+        scores = [entry["score"] for entry in document["related"]]
+        assert str(video_id) not in related_ids
+        assert len(related_ids) == RELATED_COUNT == len(set(related_ids))
+        assert scores == sorted(scores, reverse=True)
+        assert document["minScore"] == scores[-1]
+
+
+def test_closest_video_ranks_first():
+    videos = [
+        {"_id": ObjectId(), "title": "cold plunge", "reflection": "cold plunge at dawn", "tags": ["Mindset"], "day": 1},
+        {"_id": ObjectId(), "title": "cold plunge again", "reflection": "cold plunge at dawn", "tags": ["Mindset"], "day": 2},
+        {"_id": ObjectId(), "title": "shipping code", "reflection": "wrote code all night", "tags": ["Progress"], "day": 3},
+    ]
+    documents = Corpus(videos).neighbors_for([0, 1, 2])
+    assert [entry["id"] for entry in documents[videos[0]["_id"]]["related"]] == [
+        str(videos[1]["_id"]), str(videos[2]["_id"])
+    ]
+
+
+def test_min_score_is_zero_until_the_list_is_full():
+    candidates = [(0.9 - i / 100, ObjectId(), {}) for i in range(RELATED_COUNT + 2)]
+    full = top_related(candidates)
+    assert len(full["related"]) == RELATED_COUNT
+    assert full["minScore"] == full["related"][-1]["score"] == round(candidates[RELATED_COUNT - 1][0], 4)
+
+    short = top_related(candidates[:RELATED_COUNT - 1])
+    assert short["minScore"] == 0.0
+
+    # A corpus of one has nothing to relate to
+    lone = Corpus([{"_id": ObjectId(), "title": "solo", "tags": [], "day": 1}]).neighbors_for([0])
+    assert list(lone.values()) == [{"related": [], "minScore": 0.0}]
+
+
+def test_delete_drops_the_video_from_every_list(db):
+    rng = random.Random(11)
+    videos = [make_video(rng, day) for day in range(1, 30)]
+    run(db.videos.insert_many(videos))
+    run(rebuild_related(db))
+
+    # The video that appears in the most lists
+    rows, lists = run(stored(db))
+    appearances = {}
+    for document in lists.values():
+        for entry in document["related"]:
+            appearances[entry["id"]] = appearances.get(entry["id"], 0) + 1
+    target = max(appearances, key=appearances.get)
+    assert appearances[target] > 1
+
+    run(db.videos.delete_one({"_id": ObjectId(target)}))
+    run(refresh_related(db, target))
+    rows, lists = run(stored(db))
+    assert ObjectId(target) not in rows and ObjectId(target) not in lists
+    assert not any(entry["id"] == target for document in lists.values() for entry in document["related"])
+    assert all(len(document["related"]) == RELATED_COUNT for document in lists.values())
+    assert_consistent(rows, lists)
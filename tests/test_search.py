@@ -0,0 +1,111 @@
+import pytest
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from indexes import INDEXES
+from utils.cache import video_cache
+from utils.search import highlight, highlight_pattern, make_snippet, search_terms
+
+
+def test_search_terms():
+    assert search_terms('"morning routine" gym -rest') == ["morning", "routine", "gym"]
+
+
+def test_highlight_escapes_and_marks():
+    pattern = highlight_pattern(["jerry"])
+    assert highlight("Tom & <Jerry>", pattern) == "Tom &amp; &lt;<mark>Jerry</mark>&gt;"
+
+
+def test_highlight_never_matches_inside_entities():
+    assert highlight("Tom & Jerry", highlight_pattern(["amp"])) == "Tom &amp; Jerry"
+    assert highlight("a < b", highlight_pattern(["lt"])) == "a &lt; b"
+
+
+def test_highlight_escapes_matched_text():
+    assert highlight("R&D day", highlight_pattern(["r&d"])) == "<mark>R&amp;D</mark> day"
+
+
+def test_snippet_centres_on_real_match():
+    text = "Fish & chips " * 30 + "then a long gym session"
+    snippet = make_snippet(text, highlight_pattern(["gym", "amp"]), length=40)
+    assert "<mark>gym</mark>" in snippet
+    assert snippet.startswith("...")
+
+
+def test_snippet_without_match():
+    assert make_snippet("short & sweet", highlight_pattern(["absent"])) == "short &amp; sweet"
+
+
+def test_text_index_weights():
+    text_index = next(model.document for model in INDEXES["videos"] if "weights" in model.document)
+    assert text_index["weights"] == {"title": 10, "tags": 5, "reflection": 1}
+
+
+class FakeVideos:
+    """Stands in for db.videos: mongomock has no $text, so aggregate is scripted"""
+
+    def __init__(self, result):
+        self.result = result
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        result = self.result
+
+        class Cursor:
+            async def to_list(self, length):
+                if isinstance(result, Exception):
+                    raise result
+                return result[:length]
+        return Cursor()
+
+
+@pytest.fixture
+def search(monkeypatch):
+    pytest.importorskip("httpx")
+    from starlette.testclient import TestClient
+    import server
+    from routes import videos
+
+    video_cache.invalidate()
+
+    def client_with(result):
+        fake = FakeVideos(result)
+        monkeypatch.setattr(videos, "db", type("FakeDb", (), {"videos": fake})())
+        return TestClient(server.app), fake
+    return client_with
+
+
+def test_search_route_highlights_and_pages(search):
+    found = [
+        {"_id": ObjectId(), "title": "Gym & grit", "reflection": "Long gym day", "day": day, "score": 3.0 - day}
+        for day in (1, 2, 3)
+    ]
+    client, fake = search(found)
+    response = client.get("/api/videos/search", params={"q": "gym", "limit": 2})
+    assert response.status_code == 200
+    body = response.json()
+    assert [video["day"] for video in body["videos"]] == [1, 2]
+    assert body["videos"][0]["titleHighlight"] == "<mark>Gym</mark> &amp; grit"
+    assert body["videos"][0]["snippet"] == "Long <mark>gym</mark> day"
+    assert body["pagination"]["hasNext"] and body["pagination"]["nextCursor"]
+    assert fake.pipelines[0][0] == {"$match": {"$text": {"$search": "gym"}}}
+
+
+def test_search_without_text_index_is_unavailable(search):
+    client, _ = search(OperationFailure("text index required for $text query", code=27))
+    response = client.get("/api/videos/search", params={"q": "gym"})
+    assert response.status_code == 503
+    assert response.json()["detail"] == "Search index is not ready"
+
+
+def test_search_other_failures_are_server_errors(search):
+    client, _ = search(OperationFailure("boom", code=2))
+    assert client.get("/api/videos/search", params={"q": "gym"}).status_code == 500
+
+
+def test_search_rejects_bad_parameters(search):
+    client, fake = search([])
+    assert client.get("/api/videos/search", params={"q": "   "}).status_code == 400
+    assert client.get("/api/videos/search", params={"q": "gym", "limit": 0}).status_code == 400
+    assert fake.pipelines == []
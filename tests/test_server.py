@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("httpx")
+from starlette.testclient import TestClient
+
+
+@pytest.fixture
+def client(mock_db):
+    import server
+    from utils.cache import video_cache
+    from utils.counts import video_counts
+    video_cache.invalidate()
+    video_counts.invalidate()
+    # No `with`: the lifespan would ping and index a real server
+    return TestClient(server.app)
+
+
+def test_server_imports():
+    import server
+    assert server.app.routes
+
+
+def test_cached_video_list(client, mock_db):
+    now = datetime.utcnow()
+    asyncio.run(mock_db.videos.delete_many({}))
+    asyncio.run(mock_db.videos.insert_many([
+        {"title": f"Day {day}", "youtubeId": f"yt{day}", "embedUrl": "", "day": day,
+         "date": "2024-01-01", "reflection": "", "tags": ["Average2Epic"], "excerpt": "",
+         "createdAt": now, "updatedAt": now}
+        for day in (1, 2, 3)
+    ]))
+
+    first = client.get("/api/videos", params={"limit": 2})
+    assert first.status_code == 200
+    body = first.json()
+    assert [video["day"] for video in body["videos"]] == [3, 2]
+    assert body["pagination"]["totalVideos"] == 3
+    assert first.headers["etag"]
+
+    second = client.get("/api/videos", params={"limit": 2}, headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 304
+
+
+@pytest.mark.parametrize("params", [
+    {"after": "", "limit": 0},
+    {"limit": 0},
+    {"limit": 101},
+    {"page": 0},
+])
+def test_video_list_rejects_bad_paging(client, params):
+    response = client.get("/api/videos", params=params)
+    assert response.status_code == 400
+
+
+def test_cached_list_is_served_compressed(client, mock_db):
+    from utils.cache import video_cache
+    asyncio.run(mock_db.videos.delete_many({}))
+    asyncio.run(mock_db.videos.insert_one({
+        "title": "Day 1", "youtubeId": "yt1", "embedUrl": "", "day": 1, "date": "2024-01-01",
+        "reflection": "discipline " * 500, "tags": [], "excerpt": ""
+    }))
+    params = {"limit": 1, "fields": "full"}
+
+    first = client.get("/api/videos", params=params, headers={"Accept-Encoding": "gzip"})
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.headers["etag"].endswith('-gzip"')
+    assert first.json()["videos"][0]["reflection"].startswith("discipline")
+    # Only the requested encoding was compressed and kept
+    (entry,) = [value for _, value in video_cache._entries.values()]
+    assert list(entry.encoded) == ["gzip"]
+
+    plain = client.get("/api/videos", params=params, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert client.get("/api/videos", params=params, headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+
+def test_disabled_cache_leaves_compression_to_middleware(client, mock_db, monkeypatch):
+    from utils.cache import video_cache
+    monkeypatch.setattr(video_cache, "ttl", 0)
+    asyncio.run(mock_db.videos.delete_many({}))
+    asyncio.run(mock_db.videos.insert_one({
+        "title": "Day 1", "youtubeId": "yt1", "embedUrl": "", "day": 1, "date": "2024-01-01",
+        "reflection": "discipline " * 500, "tags": [], "excerpt": ""
+    }))
+    response = client.get("/api/videos", params={"limit": 1, "fields": "full"}, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"].endswith('-gzip"')
+    assert video_cache.stats()["entries"] == 0
+
+
+def test_sync_bookkeeping_is_not_returned(client, mock_db):
+    asyncio.run(mock_db.videos.delete_many({}))
+    result = asyncio.run(mock_db.videos.insert_one({
+        "title": "Day 1", "youtubeId": "yt1", "embedUrl": "", "day": 1, "date": "2024-01-01",
+        "reflection": "", "tags": [], "excerpt": "", "contentHash": "abc", "lastFetchedAt": datetime.utcnow()
+    }))
+    detail = client.get(f"/api/videos/{result.inserted_id}").json()
+    (listed,) = client.get("/api/videos", params={"fields": "full"}).json()["videos"]
+    for video in (detail, listed):
+        assert video["id"] == str(result.inserted_id)
+        assert "contentHash" not in video and "lastFetchedAt" not in video